@@ -1,3 +1,6 @@
-__all__ = []
+import time
 
+# Taken before any submodule (and its SDK imports) loads; used for cold-start timings
+PROCESS_STARTED = time.perf_counter()
 
+__all__ = []
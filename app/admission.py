@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Tuple
+
+from .settings import Settings
+from .summary import EMERGENCY_KEYWORDS
+
+
+PRIORITY_EMERGENCY = 0
+PRIORITY_FINAL = 1
+PRIORITY_PARTIAL = 2
+
+PRIORITY_NAMES = {
+    PRIORITY_EMERGENCY: "emergency",
+    PRIORITY_FINAL: "final",
+    PRIORITY_PARTIAL: "partial",
+}
+
+PARTIAL_EVENTS = {"transcript.partial", "asr.partial"}
+
+# Spoken instead of an LLM reply when a turn is shed under overload
+DEGRADED_REPLIES = {
+    PRIORITY_EMERGENCY: "I hear you. Please get somewhere safe; a dispatcher will call you right back.",
+    PRIORITY_FINAL: "Thanks, got it. Give me just a moment.",
+}
+
+
+def classify_priority(event_type: Optional[str], transcript: str) -> int:
+    text = (transcript or "").lower()
+    if any(kw in text for kw in EMERGENCY_KEYWORDS):
+        return PRIORITY_EMERGENCY
+    if event_type in PARTIAL_EVENTS:
+        return PRIORITY_PARTIAL
+    return PRIORITY_FINAL
+
+
+class _LatencyStats:
+    def __init__(self, window: int = 512) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent: Deque[float] = deque(maxlen=window)
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.recent.append(seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        ordered = sorted(self.recent)
+
+        def pct(p: float) -> float:
+            if not ordered:
+                return 0.0
+            return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000, 2)
+
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total / self.count * 1000, 2) if self.count else 0.0,
+            "p50_ms": pct(0.50),
+            "p95_ms": pct(0.95),
+            "max_ms": round(self.max * 1000, 2),
+        }
+
+
+class AdmissionController:
+    """Bounded in-flight limit with a priority wait queue, for one worker process.
+
+    Lower priority values are admitted first. Partial-transcript turns are never
+    queued: if no slot is free they are shed at once. Other turns wait up to
+    ``max_wait_seconds`` and are shed if the queue is full or the wait expires.
+    """
+
+    def __init__(self, max_in_flight: int = 8, max_queue: int = 64, max_wait_seconds: float = 2.0) -> None:
+        self.max_in_flight = max(max_in_flight, 1)
+        self.max_queue = max(max_queue, 0)
+        self.max_wait_seconds = max_wait_seconds
+        self.in_flight = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = 0
+        self.admitted: Dict[int, int] = {p: 0 for p in PRIORITY_NAMES}
+        self.shed: Dict[int, int] = {p: 0 for p in PRIORITY_NAMES}
+        self.wait_latency: Dict[int, _LatencyStats] = {p: _LatencyStats() for p in PRIORITY_NAMES}
+        self.service_latency: Dict[int, _LatencyStats] = {p: _LatencyStats() for p in PRIORITY_NAMES}
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(1 for _, _, fut in self._waiters if not fut.done())
+
+    async def acquire(self, priority: int) -> bool:
+        """Take a slot; returns False when the turn is shed instead."""
+        if self.in_flight < self.max_in_flight and not self.queue_depth:
+            self.in_flight += 1
+            return True
+        if priority == PRIORITY_PARTIAL or self.queue_depth >= self.max_queue:
+            return False
+
+        fut: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._seq += 1
+        heapq.heappush(self._waiters, (priority, self._seq, fut))
+        try:
+            await asyncio.wait_for(asyncio.shield(fut), timeout=self.max_wait_seconds)
+            return True
+        except asyncio.TimeoutError:
+            if fut.done() and not fut.cancelled():
+                # Slot was handed over just as the wait expired; keep it
+                return True
+            fut.cancel()
+            return False
+        except asyncio.CancelledError:
+            # The request went away while queued: withdraw, or pass on a slot handed over meanwhile
+            if fut.done() and not fut.cancelled():
+                self.release()
+            else:
+                fut.cancel()
+            raise
+
+    def release(self) -> None:
+        while self._waiters:
+            _, _, fut = heapq.heappop(self._waiters)
+            if not fut.done():
+                # Hand the slot straight to the highest-priority waiter
+                fut.set_result(None)
+                return
+        self.in_flight = max(self.in_flight - 1, 0)
+
+    @asynccontextmanager
+    async def slot(self, priority: int) -> AsyncIterator[bool]:
+        started = time.perf_counter()
+        admitted = await self.acquire(priority)
+        if not admitted:
+            self.shed[priority] += 1
+            yield False
+            return
+        self.admitted[priority] += 1
+        self.wait_latency[priority].add(time.perf_counter() - started)
+        try:
+            yield True
+        finally:
+            self.release()
+            self.service_latency[priority].add(time.perf_counter() - started)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "queue_depth": self.queue_depth,
+            "max_queue": self.max_queue,
+            "priorities": {
+                name: {
+                    "admitted": self.admitted[p],
+                    "shed": self.shed[p],
+                    "wait": self.wait_latency[p].snapshot(),
+                    "latency": self.service_latency[p].snapshot(),
+                }
+                for p, name in PRIORITY_NAMES.items()
+            },
+        }
+
+
+_controller: Optional[AdmissionController] = None
+
+
+def get_admission_controller(settings: Settings) -> AdmissionController:
+    global _controller
+    if _controller is not None:
+        return _controller
+    _controller = AdmissionController(
+        max_in_flight=settings.webhook_max_in_flight,
+        max_queue=settings.webhook_max_queue,
+        max_wait_seconds=settings.webhook_max_wait_seconds,
+    )
+    return _controller
+
+
+__all__ = [
+    "AdmissionController",
+    "classify_priority",
+    "get_admission_controller",
+    "DEGRADED_REPLIES",
+    "PRIORITY_EMERGENCY",
+    "PRIORITY_FINAL",
+    "PRIORITY_PARTIAL",
+]
@@ -0,0 +1,237 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+# Counters are stored per hour and per config; coarser views are re-bucketed on read
+BUCKET_SECONDS = 3600
+GRANULARITY_SECONDS = {"hour": 3600, "day": 86400}
+NO_CONFIG = 0
+
+ANALYTICS_TABLE = "call_analytics"
+INCREMENT_RPC = "increment_call_analytics"
+SUMMARY_RPC = "update_call_log_summary"
+REBUILD_RPC = "rebuild_call_analytics"
+
+# Dimensions reported as {value: count} maps
+BREAKDOWN_DIMENSIONS = ("call_outcome", "driver_status", "emergency_type")
+# Per-call flags reported as rates of total calls
+FLAG_RATES = {"emergency": "emergency_rate", "noisy": "noisy_rate", "uncooperative": "uncooperative_rate"}
+
+
+class SummaryConflict(RuntimeError):
+    """The call log kept changing under a versioned summary write; safe to retry later."""
+
+
+def parse_timestamp(value: Any) -> datetime:
+    if isinstance(value, datetime):
+        ts = value
+    elif value:
+        ts = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    else:
+        ts = datetime.now(timezone.utc)
+    return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+
+def bucket_start(created_at: Any, bucket_seconds: int = BUCKET_SECONDS) -> str:
+    ts = parse_timestamp(created_at).astimezone(timezone.utc)
+    epoch = int(ts.timestamp())
+    return datetime.fromtimestamp(epoch - epoch % bucket_seconds, tz=timezone.utc).isoformat()
+
+
+def summary_dimensions(summary: Optional[Dict[str, Any]]) -> List[Tuple[str, str]]:
+    """(dimension, value) pairs one call contributes to the counters."""
+    if not summary:
+        return []
+    dims: List[Tuple[str, str]] = [("calls", "total")]
+    for name in BREAKDOWN_DIMENSIONS:
+        value = summary.get(name)
+        if value:
+            dims.append((name, str(value)))
+    outcome = summary.get("call_outcome") or ""
+    if summary.get("emergency"):
+        dims.append(("flag", "emergency"))
+    if outcome.startswith("Noisy Environment"):
+        dims.append(("flag", "noisy"))
+    if outcome == "Uncooperative Driver":
+        dims.append(("flag", "uncooperative"))
+    return dims
+
+
+def summary_deltas(
+    old_summary: Optional[Dict[str, Any]],
+    new_summary: Optional[Dict[str, Any]],
+    created_at: Any,
+    config_id: Optional[int],
+) -> List[Dict[str, Any]]:
+    """Counter changes for replacing one call's summary; unchanged dimensions cancel out."""
+    counts: Dict[Tuple[str, str], int] = defaultdict(int)
+    for dim in summary_dimensions(old_summary):
+        counts[dim] -= 1
+    for dim in summary_dimensions(new_summary):
+        counts[dim] += 1
+    bucket = bucket_start(created_at)
+    return [
+        {
+            "bucket_start": bucket,
+            "config_id": config_id or NO_CONFIG,
+            "dimension": dimension,
+            "value": value,
+            "count": delta,
+        }
+        for (dimension, value), delta in counts.items()
+        if delta
+    ]
+
+
+def apply_deltas(supabase: Any, deltas: List[Dict[str, Any]]) -> None:
+    if deltas:
+        # Atomic upsert-and-add in Postgres so concurrent workers don't lose increments
+        supabase.rpc(INCREMENT_RPC, {"deltas": deltas}).execute()
+
+
+def update_call_log_summary(
+    supabase: Any,
+    call_log_id: int,
+    update_data: Dict[str, Any],
+    current: Optional[Dict[str, Any]] = None,
+    max_attempts: int = 5,
+) -> None:
+    """Write a call's transcript and summary and move its counters in one transaction.
+
+    The deltas are computed against the summary being replaced: the write only
+    applies if ``summary_version`` is unchanged since it was read, otherwise the
+    row is read again and the deltas recomputed. ``current`` is a row the caller
+    already holds (with ``summary_version``), saving the first read.
+    """
+    row = current if current is not None and "summary_version" in current else None
+    for _ in range(max_attempts):
+        if row is None:
+            result = (
+                supabase.table("call_logs")
+                .select("id,created_at,config_id,structured_summary,summary_version")
+                .eq("id", call_log_id)
+                .limit(1)
+                .execute()
+            )
+            rows = result.data or []
+            if not rows:
+                raise LookupError(f"Call log {call_log_id} not found")
+            row = rows[0]
+        deltas = summary_deltas(
+            row.get("structured_summary"), update_data.get("structured_summary"), row.get("created_at"), row.get("config_id")
+        )
+        result = supabase.rpc(
+            SUMMARY_RPC,
+            {"p_id": call_log_id, "p_version": row.get("summary_version") or 0, "p_update": update_data, "p_deltas": deltas},
+        ).execute()
+        if result.data:
+            return
+        # Another event for this call was written first; recompute against its summary
+        row = None
+    raise SummaryConflict(f"Call log {call_log_id} kept changing; gave up after {max_attempts} attempts")
+
+
+def rebuild(supabase: Any) -> int:
+    """Recompute every counter from call_logs history in one transaction; returns the number of calls scanned."""
+    result = supabase.rpc(REBUILD_RPC, {"bucket_seconds": BUCKET_SECONDS}).execute()
+    return int(result.data or 0)
+
+
+def _empty_view() -> Dict[str, Any]:
+    return {"calls": 0, **{name: {} for name in BREAKDOWN_DIMENSIONS}, "flags": {}}
+
+
+def _add(view: Dict[str, Any], row: Dict[str, Any]) -> None:
+    dimension, value, count = row["dimension"], row["value"], int(row["count"])
+    if dimension == "calls":
+        view["calls"] += count
+    elif dimension == "flag":
+        view["flags"][value] = view["flags"].get(value, 0) + count
+    elif dimension in BREAKDOWN_DIMENSIONS:
+        view[dimension][value] = view[dimension].get(value, 0) + count
+
+
+def _finish(view: Dict[str, Any]) -> Dict[str, Any]:
+    flags = view.pop("flags")
+    calls = view["calls"]
+    for flag, rate_name in FLAG_RATES.items():
+        view[rate_name] = round(flags.get(flag, 0) / calls, 4) if calls else 0.0
+    return view
+
+
+def summarize(counter_rows: Iterable[Dict[str, Any]], granularity: str = "hour") -> Dict[str, Any]:
+    """Fold stored counter rows into per-bucket, per-config and overall views."""
+    step = GRANULARITY_SECONDS[granularity]
+    buckets: Dict[str, Dict[str, Any]] = defaultdict(_empty_view)
+    by_config: Dict[int, Dict[str, Any]] = defaultdict(_empty_view)
+    totals = _empty_view()
+    for row in counter_rows:
+        _add(buckets[bucket_start(row["bucket_start"], step)], row)
+        _add(by_config[int(row.get("config_id") or NO_CONFIG)], row)
+        _add(totals, row)
+    return {
+        "granularity": granularity,
+        "buckets": [{"bucket_start": b, **_finish(v)} for b, v in sorted(buckets.items())],
+        "by_config": {str(c): _finish(v) for c, v in sorted(by_config.items())},
+        "totals": _finish(totals),
+    }
+
+
+def parse_bounds(since: Optional[str], until: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """Normalise the query range to bucket-aligned UTC bounds; raises ValueError on a malformed timestamp."""
+    lower = bucket_start(since) if since else None
+    upper = parse_timestamp(until).astimezone(timezone.utc).isoformat() if until else None
+    return lower, upper
+
+
+def query(
+    supabase: Any,
+    granularity: str = "hour",
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    config_id: Optional[int] = None,
+    page_size: int = 1000,
+) -> Dict[str, Any]:
+    lower, upper = parse_bounds(since, until)
+    rows: List[Dict[str, Any]] = []
+    # PostgREST caps each response (1000 rows by default), so read in pages
+    while True:
+        q = supabase.table(ANALYTICS_TABLE).select("bucket_start,config_id,dimension,value,count")
+        if lower:
+            q = q.gte("bucket_start", lower)
+        if upper:
+            q = q.lt("bucket_start", upper)
+        if config_id is not None:
+            q = q.eq("config_id", config_id)
+        result = (
+            q.order("bucket_start")
+            .order("config_id")
+            .order("dimension")
+            .order("value")
+            .range(len(rows), len(rows) + page_size - 1)
+            .execute()
+        )
+        page = result.data or []
+        rows.extend(page)
+        if len(page) < page_size:
+            break
+    return summarize(rows, granularity)
+
+
+__all__ = [
+    "bucket_start",
+    "summary_dimensions",
+    "summary_deltas",
+    "apply_deltas",
+    "update_call_log_summary",
+    "rebuild",
+    "summarize",
+    "parse_bounds",
+    "parse_timestamp",
+    "query",
+    "SummaryConflict",
+    "GRANULARITY_SECONDS",
+]
@@ -0,0 +1,85 @@
+from typing import Dict, Any, Optional, Callable
+
+from .settings import Settings
+from .retell import trigger_retell_call
+from .spool import get_call_log_spool
+
+
+class CallPlacementError(Exception):
+    """Raised when a call cannot be placed; carries the HTTP status to surface."""
+
+    def __init__(self, status_code: int, detail: str) -> None:
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def place_call(
+    supabase: Any,
+    settings: Settings,
+    driver_name: str,
+    phone_number: str,
+    load_number: str,
+    config_id: int,
+    trigger: Callable[..., Dict[str, Any]] = trigger_retell_call,
+) -> Dict[str, Any]:
+    # Validate config exists
+    cfg = (
+        supabase.table("agent_config").select("id,prompt,settings").eq("id", config_id).limit(1).execute()
+    )
+    if not (cfg.data and len(cfg.data) == 1):
+        raise CallPlacementError(400, "Invalid config_id")
+
+    # Get agent_id from settings - required for real Retell AI calls
+    config_data = cfg.data[0] or {}
+    agent_id = config_data.get("settings", {}).get("retell_agent_id")
+    if not agent_id:
+        raise CallPlacementError(
+            400,
+            "Agent configuration must include 'retell_agent_id' in settings. Please configure your Retell AI agent first.",
+        )
+
+    # Trigger Retell
+    try:
+        retell_result = trigger(
+            api_key=settings.retell_api_key,
+            driver_name=driver_name,
+            phone_number=phone_number,
+            load_number=load_number,
+            agent_id=agent_id,
+            config_id=config_id,
+            base_url=f"{settings.retell_base_url.rstrip('/')}{settings.retell_start_call_path if settings.retell_start_call_path.startswith('/') else '/' + settings.retell_start_call_path}",
+            webhook_url=f"{settings.webhook_base_url}/webhook",
+            voice_settings=(config_data.get("settings", {}).get("voice_settings") if isinstance(config_data.get("settings"), dict) else None),
+            from_number=settings.retell_from_number or None,
+        )
+    except Exception as exc:  # pragma: no cover - external API
+        raise CallPlacementError(502, f"Retell API error: {exc}")
+
+    external_call_id: Optional[str] = retell_result.get("call_id") if isinstance(retell_result, dict) else None
+
+    # Save initial call log
+    insert_payload = {
+        "driver_name": driver_name,
+        "phone_number": phone_number,
+        "load_number": load_number,
+        "transcript": None,
+        "structured_summary": None,
+        "external_call_id": external_call_id,
+        "config_id": config_id,
+    }
+    # Ensure columns exist in Supabase: external_call_id, config_id
+    spool = get_call_log_spool(settings)
+    if spool is not None:
+        # Committed locally first; replayed to Supabase in the background
+        row = spool.insert_call_log(insert_payload)
+    else:
+        result = supabase.table("call_logs").insert(insert_payload).execute()
+        row = (result.data or [None])[0]
+    if row is None:
+        raise CallPlacementError(500, "Failed to save call log")
+
+    return {"call_id": row.get("id"), "external_call_id": external_call_id}
+
+
+__all__ = ["CallPlacementError", "place_call"]
@@ -1,21 +1,23 @@
-from typing import Optional
-from supabase import create_client, Client
+from typing import Optional, TYPE_CHECKING
 from .settings import Settings
 
+if TYPE_CHECKING:  # supabase is heavy to import; load it on first use
+    from supabase import Client
 
-_client: Optional[Client] = None
 
+_client: Optional["Client"] = None
 
-def get_supabase(settings: Settings) -> Client:
+
+def get_supabase(settings: Settings) -> "Client":
     global _client
     if _client is not None:
         return _client
     if not settings.supabase_url or not settings.supabase_key:
         raise RuntimeError("Supabase credentials are not configured")
+    from supabase import create_client
+
     _client = create_client(settings.supabase_url, settings.supabase_key)
     return _client
 
 
 __all__ = ["get_supabase"]
-
-
@@ -0,0 +1,338 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .db import get_supabase
+from .schemas import WebhookPayload
+from .settings import Settings
+
+
+logger = logging.getLogger(__name__)
+
+# Answer for a delivery another worker is still processing. It may yet fail, so this
+# goes out with a retryable status (503 plus Retry-After), never as a 200
+IN_PROGRESS = {"ok": False, "skipped": "in_progress"}
+IN_PROGRESS_RETRY_AFTER_SECONDS = 5
+
+
+@dataclass
+class _Entry:
+    stored_at: float
+    # Resolves to the first delivery's response; duplicates arriving mid-flight await it
+    result: asyncio.Future
+
+
+@dataclass
+class _CallProgress:
+    sequence: Optional[int] = None
+    transcript: str = ""
+
+
+@dataclass
+class DedupStats:
+    processed: int = 0
+    duplicates_served: int = 0
+    duplicates_joined: int = 0
+    # Repeats first seen by another worker, answered via the shared index
+    duplicates_shared: int = 0
+    shared_errors: int = 0
+    # Times the breaker tripped and the shared index was skipped for a cooldown
+    shared_skipped_windows: int = 0
+    stale_dropped: int = 0
+    evicted: int = 0
+
+    def snapshot(self) -> Dict[str, int]:
+        return dict(self.__dict__)
+
+
+def event_key(payload: WebhookPayload) -> Optional[Tuple[str, str]]:
+    """(call id, event identity): event id, else sequence number, else a transcript hash."""
+    if payload.call_id is None:
+        return None
+    call_id = str(payload.call_id)
+    if payload.event_id is not None:
+        return call_id, f"id:{payload.event_id}"
+    if payload.sequence is not None:
+        return call_id, f"seq:{payload.event_type}:{payload.sequence}"
+    digest = hashlib.blake2b(
+        f"{payload.event_type}\x00{payload.transcript}".encode("utf-8"), digest_size=16
+    ).hexdigest()
+    return call_id, f"hash:{digest}"
+
+
+def _iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).isoformat()
+
+
+class SharedDeliveryIndex:
+    """Claims on webhook deliveries shared by every worker, in the ``webhook_deliveries`` table.
+
+    ``claim`` returns None when this worker should process the delivery.
+    Otherwise it returns the response to send: the one stored by the worker
+    that processed the delivery, or ``IN_PROGRESS`` while that worker is still
+    running. A claim left without a response for ``claim_timeout_seconds``
+    (its worker died) is taken over.
+    """
+
+    table = "webhook_deliveries"
+
+    def __init__(
+        self,
+        supabase: Callable[[], Any],
+        claim_timeout_seconds: float = 120.0,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.supabase = supabase
+        self.claim_timeout_seconds = claim_timeout_seconds
+        self.clock = clock
+
+    def claim(self, key: Tuple[str, str]) -> Optional[Dict[str, Any]]:
+        call_id, event = key
+        now = self.clock()
+        result = (
+            self.supabase()
+            .table(self.table)
+            .upsert({"call_id": call_id, "event_key": event, "claimed_at": _iso(now)}, ignore_duplicates=True)
+            .execute()
+        )
+        if result.data:
+            return None
+        rows = (
+            self.supabase().table(self.table).select("response").eq("call_id", call_id).eq("event_key", event).limit(1).execute()
+        ).data or []
+        if not rows:
+            # Released by a failed attempt in the meantime
+            return None
+        if rows[0].get("response") is not None:
+            return rows[0]["response"]
+        taken = (
+            self.supabase()
+            .table(self.table)
+            .update({"claimed_at": _iso(now)})
+            .eq("call_id", call_id)
+            .eq("event_key", event)
+            .is_("response", "null")
+            .lt("claimed_at", _iso(now - self.claim_timeout_seconds))
+            .execute()
+        )
+        return None if taken.data else IN_PROGRESS
+
+    def store(self, key: Tuple[str, str], response: Dict[str, Any]) -> None:
+        call_id, event = key
+        self.supabase().table(self.table).update({"response": response}).eq("call_id", call_id).eq("event_key", event).execute()
+
+    def release(self, key: Tuple[str, str]) -> None:
+        call_id, event = key
+        (
+            self.supabase()
+            .table(self.table)
+            .delete()
+            .eq("call_id", call_id)
+            .eq("event_key", event)
+            .is_("response", "null")
+            .execute()
+        )
+
+
+class EventDeduplicator:
+    """Bounded, time-windowed index of processed webhook deliveries for one worker process.
+
+    ``begin`` returns None when a delivery should be processed, or the response
+    to send back unchanged when it is a retry of one already seen (waiting for
+    the first delivery to finish if it is still in flight) or an out-of-order
+    event older than the latest transcript processed for the call.
+
+    The local index only sees this worker's deliveries. With a ``shared``
+    index, a retry that reaches another worker is also recognised. Each call
+    to the shared index gets ``shared_timeout_seconds``. A failed or late call
+    is logged and the local index alone decides. After ``breaker_failures``
+    failures in a row the shared index is skipped for ``breaker_cooldown_seconds``.
+    The stale-event check is local only.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = 600.0,
+        max_entries: int = 10000,
+        clock: Callable[[], float] = time.monotonic,
+        shared: Optional[SharedDeliveryIndex] = None,
+        shared_timeout_seconds: float = 1.0,
+        breaker_failures: int = 3,
+        breaker_cooldown_seconds: float = 30.0,
+    ) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max(max_entries, 1)
+        self.clock = clock
+        self.shared = shared
+        self.shared_timeout_seconds = shared_timeout_seconds
+        self.breaker_failures = max(breaker_failures, 1)
+        self.breaker_cooldown_seconds = breaker_cooldown_seconds
+        self._shared_failures = 0
+        self._shared_skip_until = 0.0
+        self._entries: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+        self._progress: "OrderedDict[str, _CallProgress]" = OrderedDict()
+        self.stats = DedupStats()
+
+    def _evict(self, now: float) -> None:
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if len(self._entries) <= self.max_entries and now - entry.stored_at < self.ttl_seconds:
+                break
+            if not entry.result.done():
+                # Never drop an in-flight entry; later ones are newer still
+                break
+            self._entries.pop(key)
+            self.stats.evicted += 1
+        while len(self._progress) > self.max_entries:
+            self._progress.popitem(last=False)
+
+    def _shared_usable(self) -> bool:
+        return self.shared is not None and self.clock() >= self._shared_skip_until
+
+    async def _call_shared(self, what: str, fn: Callable[..., Any], key: Tuple[str, str], *args: Any) -> Tuple[bool, Any]:
+        """Run one shared-index call under the deadline and the breaker; returns (succeeded, result)."""
+        try:
+            result = await asyncio.wait_for(asyncio.to_thread(fn, key, *args), timeout=self.shared_timeout_seconds)
+        except Exception:
+            self.stats.shared_errors += 1
+            self._shared_failures += 1
+            logger.warning("Shared webhook dedup %s failed for %s; deduplicating locally", what, key, exc_info=True)
+            if self._shared_failures >= self.breaker_failures:
+                # Also re-opened by a single failure of the first call after the cooldown
+                self._shared_skip_until = self.clock() + self.breaker_cooldown_seconds
+                self.stats.shared_skipped_windows += 1
+                logger.warning("Skipping the shared webhook dedup index for %.0fs", self.breaker_cooldown_seconds)
+            return False, None
+        self._shared_failures = 0
+        return True, result
+
+    def _is_stale(self, payload: WebhookPayload) -> bool:
+        progress = self._progress.get(str(payload.call_id))
+        if progress is None or payload.event_type == "call_ended":
+            return False
+        if payload.sequence is not None and progress.sequence is not None:
+            return payload.sequence < progress.sequence
+        # Transcripts are cumulative: a strict prefix of what we already handled is an old event
+        return (
+            bool(payload.transcript)
+            and len(payload.transcript) < len(progress.transcript)
+            and progress.transcript.startswith(payload.transcript)
+        )
+
+    async def begin(self, payload: WebhookPayload) -> Optional[Dict[str, Any]]:
+        key = event_key(payload)
+        if key is None:
+            return None
+        now = self.clock()
+        self._evict(now)
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry.result.done():
+                self.stats.duplicates_served += 1
+                return entry.result.result()
+            self.stats.duplicates_joined += 1
+            return await asyncio.shield(entry.result)
+
+        if self._is_stale(payload):
+            self.stats.stale_dropped += 1
+            return {"ok": True, "skipped": "stale"}
+
+        entry = _Entry(stored_at=now, result=asyncio.get_running_loop().create_future())
+        self._entries[key] = entry
+        if not self._shared_usable():
+            return None
+        _, cached = await self._call_shared("claim", self.shared.claim, key)
+        if cached is None:
+            return None
+        self.stats.duplicates_shared += 1
+        if cached is IN_PROGRESS:
+            # Not an answer to remember: a later retry should look at the shared index again
+            self._entries.pop(key, None)
+            cached = dict(IN_PROGRESS)
+        entry.result.set_result(cached)
+        return cached
+
+    async def complete(self, payload: WebhookPayload, response: Dict[str, Any]) -> None:
+        key = event_key(payload)
+        if key is None:
+            return
+        entry = self._entries.get(key)
+        if entry is not None and not entry.result.done():
+            entry.result.set_result(response)
+        self.stats.processed += 1
+
+        call_id = key[0]
+        progress = self._progress.pop(call_id, None) or _CallProgress()
+        if payload.sequence is not None:
+            progress.sequence = max(progress.sequence or payload.sequence, payload.sequence)
+        if not progress.transcript.startswith(payload.transcript):
+            progress.transcript = payload.transcript
+        self._progress[call_id] = progress
+
+        if self._shared_usable():
+            # Awaited: a claim left without its response would be taken over and processed twice
+            await self._call_shared("store", self.shared.store, key, response)
+
+    def abort(self, payload: WebhookPayload, exc: BaseException) -> None:
+        """Forget a failed delivery so Retell's retry is processed afresh; waiters see the error."""
+        key = event_key(payload)
+        if key is None:
+            return
+        entry = self._entries.pop(key, None)
+        if entry is not None and not entry.result.done():
+            entry.result.set_exception(exc)
+            # Mark retrieved so an entry nobody awaited doesn't log "exception never retrieved"
+            entry.result.exception()
+        if self._shared_usable():
+            # Best effort and not awaited (this may run during cancellation); an unreleased claim expires
+            asyncio.get_running_loop().run_in_executor(None, self._release_quietly, key)
+
+    def _release_quietly(self, key: Tuple[str, str]) -> None:
+        try:
+            self.shared.release(key)
+        except Exception:
+            self.stats.shared_errors += 1
+            logger.warning("Failed to release shared webhook dedup claim for %s", key, exc_info=True)
+
+
+_deduplicator: Optional[EventDeduplicator] = None
+
+
+def get_event_deduplicator(settings: Settings) -> EventDeduplicator:
+    global _deduplicator
+    if _deduplicator is not None:
+        return _deduplicator
+    shared = None
+    if settings.webhook_dedup_shared and settings.supabase_url and settings.supabase_key:
+        shared = SharedDeliveryIndex(
+            lambda: get_supabase(settings),
+            claim_timeout_seconds=settings.webhook_dedup_claim_timeout_seconds,
+        )
+    _deduplicator = EventDeduplicator(
+        ttl_seconds=settings.webhook_dedup_ttl_seconds,
+        max_entries=settings.webhook_dedup_max_entries,
+        shared=shared,
+        shared_timeout_seconds=settings.webhook_dedup_shared_timeout_seconds,
+        breaker_failures=settings.webhook_dedup_breaker_failures,
+        breaker_cooldown_seconds=settings.webhook_dedup_breaker_cooldown_seconds,
+    )
+    return _deduplicator
+
+
+__all__ = [
+    "EventDeduplicator",
+    "DedupStats",
+    "SharedDeliveryIndex",
+    "IN_PROGRESS",
+    "IN_PROGRESS_RETRY_AFTER_SECONDS",
+    "event_key",
+    "get_event_deduplicator",
+]
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import time
+from typing import Any, Dict
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt; stdlib fallback keeps dev envs working
+    orjson = None
+    import json
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def loads(data: bytes | str) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class CpuStats:
+    """CPU time (thread time, so other requests' work is excluded) spent per event."""
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "avg_us": round(self.total / self.count * 1e6, 2) if self.count else 0.0,
+            "max_us": round(self.max * 1e6, 2),
+        }
+
+
+parse_stats = CpuStats()
+serialize_stats = CpuStats()
+
+
+class FastJSONResponse(JSONResponse):
+    """App-wide response class: orjson encoding, with per-response serialize CPU recorded."""
+
+    def render(self, content: Any) -> bytes:
+        started = time.thread_time()
+        body = dumps(content)
+        serialize_stats.add(time.thread_time() - started)
+        return body
+
+
+def serialization_stats() -> Dict[str, Any]:
+    return {
+        "encoder": "orjson" if orjson is not None else "json",
+        "parse": parse_stats.snapshot(),
+        "serialize": serialize_stats.snapshot(),
+    }
+
+
+__all__ = ["FastJSONResponse", "dumps", "loads", "parse_stats", "serialize_stats", "serialization_stats"]
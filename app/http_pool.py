@@ -0,0 +1,23 @@
+from typing import Optional
+import httpx
+
+
+_client: Optional[httpx.Client] = None
+
+
+def get_http_client() -> httpx.Client:
+    # One pooled client per process so Retell/LLM calls reuse TLS connections
+    global _client
+    if _client is None:
+        _client = httpx.Client(timeout=30.0, limits=httpx.Limits(max_connections=100, max_keepalive_connections=20))
+    return _client
+
+
+def close_http_client() -> None:
+    global _client
+    if _client is not None:
+        _client.close()
+        _client = None
+
+
+__all__ = ["get_http_client", "close_http_client"]
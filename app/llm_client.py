@@ -1,7 +1,8 @@
 from __future__ import annotations
 
 from typing import List, Dict, Optional
-import httpx
+
+from .http_pool import get_http_client
 
 
 class LLMClient:
@@ -21,11 +22,10 @@ class OpenAIClient(LLMClient):
             "Content-Type": "application/json",
         }
         payload = {"model": self.model, "messages": messages, "temperature": 0.6}
-        with httpx.Client(timeout=30.0) as client:
-            resp = client.post(f"{self.base_url}/chat/completions", headers=headers, json=payload)
-            resp.raise_for_status()
-            data = resp.json()
-            return data["choices"][0]["message"]["content"].strip()
+        resp = get_http_client().post(f"{self.base_url}/chat/completions", headers=headers, json=payload, timeout=30.0)
+        resp.raise_for_status()
+        data = resp.json()
+        return data["choices"][0]["message"]["content"].strip()
 
 
 class GeminiClient(LLMClient):
@@ -50,21 +50,21 @@ class GeminiClient(LLMClient):
 
         params = {"temperature": 0.6}
         payload = {"contents": contents, "generationConfig": params}
-        with httpx.Client(timeout=30.0) as client:
-            resp = client.post(
-                f"{self.base_url}?key={self.api_key}",
-                headers={"Content-Type": "application/json"},
-                json=payload,
-            )
-            resp.raise_for_status()
-            data = resp.json()
-            candidates = data.get("candidates") or []
-            if not candidates:
-                return ""
-            parts = (candidates[0].get("content") or {}).get("parts") or []
-            if parts and "text" in parts[0]:
-                return parts[0]["text"].strip()
+        resp = get_http_client().post(
+            f"{self.base_url}?key={self.api_key}",
+            headers={"Content-Type": "application/json"},
+            json=payload,
+            timeout=30.0,
+        )
+        resp.raise_for_status()
+        data = resp.json()
+        candidates = data.get("candidates") or []
+        if not candidates:
             return ""
+        parts = (candidates[0].get("content") or {}).get("parts") or []
+        if parts and "text" in parts[0]:
+            return parts[0]["text"].strip()
+        return ""
 
 
 def build_messages(system_prompt: str, turns: List[Dict[str, str]], user_utterance: str) -> List[Dict[str, str]]:
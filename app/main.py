@@ -1,8 +1,11 @@
 from fastapi import FastAPI, HTTPException, Depends, Request
-from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from contextlib import asynccontextmanager, suppress
+import asyncio
+import logging
+import time
 from typing import Optional
-import httpx
+from pydantic import ValidationError
 
 from .settings import get_settings, Settings
 from .db import get_supabase
@@ -11,20 +14,94 @@ from .schemas import (
     AgentConfigOut,
     StartCallRequest,
     StartCallResponse,
+    ScheduleCallRequest,
+    ScheduledCallOut,
     WebhookPayload,
     WebhookTestRequest,
 )
-from .retell import trigger_retell_call
+from .calls import CallPlacementError, place_call
+from .dedup import IN_PROGRESS, IN_PROGRESS_RETRY_AFTER_SECONDS, get_event_deduplicator
+from .spool import CallLogSpool, get_call_log_spool
+from .admission import DEGRADED_REPLIES, classify_priority, get_admission_controller
+from .scheduler import CallScheduler, PlannedCall, get_scheduler
 from .summary import build_structured_summary
+from . import analytics
 from .conversation_controller import (
     ConversationContext,
     build_system_prompt,
     generate_reply,
 )
 from .llm_client import GeminiClient, OpenAIClient, LLMClient
-
-
-app = FastAPI(title="AI Voice Agent Backend", version="0.1.0")
+from .http_pool import close_http_client, get_http_client
+from .startup import startup_state, warm_up
+from .fastjson import FastJSONResponse, parse_stats, serialization_stats
+
+
+logger = logging.getLogger(__name__)
+
+
+async def _run_scheduler(scheduler: CallScheduler, tick_seconds: float) -> None:
+    while True:
+        try:
+            await asyncio.to_thread(scheduler.run_due)
+        except Exception:
+            logger.exception("Call scheduler tick failed")
+        await asyncio.sleep(tick_seconds)
+
+
+async def _run_spool_replay(spool: CallLogSpool, settings: Settings) -> None:
+    delay = settings.spool_replay_interval_seconds
+    while True:
+        try:
+            supabase = get_supabase(settings)
+            replayed = await asyncio.to_thread(spool.replay, supabase, settings.spool_batch_size)
+            await asyncio.to_thread(spool.prune, settings.spool_retention_seconds)
+            healthy = spool.last_error is None
+        except Exception:
+            logger.exception("Spool replay failed")
+            replayed, healthy = 0, False
+        if healthy:
+            # A full batch means there is a backlog; keep draining without waiting
+            delay = 0 if replayed >= settings.spool_batch_size else settings.spool_replay_interval_seconds
+        else:
+            # Back off exponentially while Supabase is failing
+            delay = min(max(delay, settings.spool_replay_interval_seconds) * 2, settings.spool_replay_max_backoff_seconds)
+        await asyncio.sleep(delay)
+
+
+async def _start_background(settings: Settings, background: list[asyncio.Task]) -> None:
+    state = await warm_up(settings)
+    logger.info("Startup warm-up finished: %s", state.snapshot())
+    spool = get_call_log_spool(settings)
+    if spool is not None and settings.supabase_url and settings.supabase_key:
+        background.append(asyncio.create_task(_run_spool_replay(spool, settings)))
+    if settings.scheduler_enabled and settings.supabase_url and settings.supabase_key:
+        # Every worker runs the loop; only the one holding the scheduler lease places calls
+        scheduler = get_scheduler(settings)
+        background.append(asyncio.create_task(_run_scheduler(scheduler, settings.scheduler_tick_seconds)))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    settings = get_settings()
+    # Warm up once the server is listening, so /ready answers 503 until it finishes
+    background: list[asyncio.Task] = []
+    background.append(asyncio.create_task(_start_background(settings, background)))
+    yield
+    for task in background:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+    close_http_client()
+
+
+app = FastAPI(
+    title="AI Voice Agent Backend",
+    version="0.1.0",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse,
+)
+startup_state.mark_imported()
 
 # CORS - allow all by default; tighten in production via env
 app.add_middleware(
@@ -41,6 +118,13 @@ def health() -> dict:
     return {"status": "ok"}
 
 
+@app.get("/ready")
+def ready():
+    # Readiness (unlike liveness) is 503 while warm-up runs and if a component failed to initialise
+    state = startup_state.snapshot()
+    return FastJSONResponse(state, status_code=200 if state["ready"] else 503)
+
+
 @app.post("/config", response_model=AgentConfigOut)
 def upsert_config(
     payload: AgentConfigIn,
@@ -72,13 +156,8 @@ def upsert_config(
         rows = result.data or []
         row = rows[0]
 
-    return AgentConfigOut(
-        id=row.get("id"),
-        name=row.get("name"),
-        prompt=row.get("prompt"),
-        settings=row.get("settings"),
-        created_at=row.get("created_at"),
-    )
+    # Validated once here; returning a Response skips response_model re-validation (it still documents the schema)
+    return FastJSONResponse(AgentConfigOut.model_validate(row).model_dump(mode="json"))
 
 
 @app.get("/configs")
@@ -86,7 +165,7 @@ def get_all_configs(settings: Settings = Depends(get_settings)):
     supabase = get_supabase(settings)
     try:
         result = supabase.table("agent_config").select("id,name").order("created_at", desc=True).execute()
-        return result.data or []
+        return FastJSONResponse(result.data or [])
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch configs: {str(e)}")
 
@@ -99,162 +178,205 @@ def get_config(config_id: int, settings: Settings = Depends(get_settings)):
     if not rows:
         raise HTTPException(status_code=404, detail="Config not found")
     row = rows[0]
-    return AgentConfigOut(
-        id=row.get("id"),
-        name=row.get("name"),
-        prompt=row.get("prompt"),
-        settings=row.get("settings"),
-        created_at=row.get("created_at"),
-    )
+    # Validated once here; returning a Response skips response_model re-validation (it still documents the schema)
+    return FastJSONResponse(AgentConfigOut.model_validate(row).model_dump(mode="json"))
 
 
 @app.post("/start-call", response_model=StartCallResponse)
 def start_call(request_body: StartCallRequest, settings: Settings = Depends(get_settings)):
     supabase = get_supabase(settings)
-
-    # Validate config exists
-    cfg = (
-        supabase.table("agent_config").select("id,prompt,settings").eq("id", request_body.config_id).limit(1).execute()
-    )
-    if not (cfg.data and len(cfg.data) == 1):
-        raise HTTPException(status_code=400, detail="Invalid config_id")
-    
-    # Get agent_id from settings - required for real Retell AI calls
-    config_data = cfg.data[0] or {}
-    agent_id = config_data.get("settings", {}).get("retell_agent_id")
-    if not agent_id:
-        raise HTTPException(
-            status_code=400, 
-            detail="Agent configuration must include 'retell_agent_id' in settings. Please configure your Retell AI agent first."
-        )
-
-    # Trigger Retell
     try:
-        retell_result = trigger_retell_call(
-            api_key=settings.retell_api_key,
+        placed = place_call(
+            supabase,
+            settings,
             driver_name=request_body.driver_name,
             phone_number=request_body.phone_number,
             load_number=request_body.load_number,
-            agent_id=agent_id,
             config_id=request_body.config_id,
-            base_url=f"{settings.retell_base_url.rstrip('/')}{settings.retell_start_call_path if settings.retell_start_call_path.startswith('/') else '/' + settings.retell_start_call_path}",
-            webhook_url=f"{settings.webhook_base_url}/webhook",
-            voice_settings=(config_data.get("settings", {}).get("voice_settings") if isinstance(config_data.get("settings"), dict) else None),
-            from_number=settings.retell_from_number or None,
         )
-    except Exception as exc:  # pragma: no cover - external API
-        raise HTTPException(status_code=502, detail=f"Retell API error: {exc}")
-
-    external_call_id: Optional[str] = retell_result.get("call_id") if isinstance(retell_result, dict) else None
-
-    # Save initial call log
-    insert_payload = {
-        "driver_name": request_body.driver_name,
-        "phone_number": request_body.phone_number,
-        "load_number": request_body.load_number,
-        "transcript": None,
-        "structured_summary": None,
-        "external_call_id": external_call_id,
-        "config_id": request_body.config_id,
-    }
-    # Ensure columns exist in Supabase: external_call_id, config_id
-    result = supabase.table("call_logs").insert(insert_payload).execute()
-    row = (result.data or [None])[0]
-    if row is None:
-        raise HTTPException(status_code=500, detail="Failed to save call log")
+    except CallPlacementError as exc:
+        raise HTTPException(status_code=exc.status_code, detail=exc.detail)
 
-    return StartCallResponse(call_id=row.get("id"), external_call_id=external_call_id)
+    return StartCallResponse(call_id=placed["call_id"], external_call_id=placed["external_call_id"])
 
 
-@app.post("/webhook")
-async def webhook(req: Request, settings: Settings = Depends(get_settings)):
-    # Accepts Retell webhook JSON (event-based). For simplicity, handle text events and final transcript.
-    payload_json = await req.json()
-    try:
-        payload = WebhookPayload(**payload_json)
-    except Exception:
-        # Accept lenient payloads from external service
-        payload = WebhookPayload(
-            call_id=payload_json.get("call_id"),
-            transcript=payload_json.get("transcript", ""),
-            metadata=payload_json.get("metadata", {}),
-        )
+def _require_scheduler(settings: Settings) -> CallScheduler:
+    if not settings.scheduler_enabled:
+        raise HTTPException(status_code=503, detail="Call scheduler is disabled")
+    return get_scheduler(settings)
 
-    supabase = get_supabase(settings)
 
-    # Determine which log row to update
-    call_log_query = supabase.table("call_logs").select("id").eq("external_call_id", payload.call_id).limit(1)
-    result = call_log_query.execute()
-    rows = result.data or []
-    if not rows and isinstance(payload.call_id, int):
-        # fallback if webhook sends our internal id
-        result = supabase.table("call_logs").select("id").eq("id", payload.call_id).limit(1).execute()
-        rows = result.data or []
-    if not rows:
-        raise HTTPException(status_code=404, detail="Call log not found")
-    call_log_id = rows[0]["id"]
+def _scheduled_call_out(call: PlannedCall) -> ScheduledCallOut:
+    return ScheduledCallOut(**{k: v for k, v in call.to_row().items() if k in ScheduledCallOut.model_fields})
 
-    # Live conversation loop (simplified): when we receive an incremental transcript line, generate a reply.
-    # This assumes Retell posts partial transcripts as events with metadata. Adjust to Retell's event schema if needed.
-    event_type = payload_json.get("event") or payload_json.get("type")
 
-    # Fetch config and conversation context if possible
-    config_id = payload.metadata.get("config_id") if isinstance(payload.metadata, dict) else None
-    driver_name = payload.metadata.get("driver_name") if isinstance(payload.metadata, dict) else None
-    load_number = payload.metadata.get("load_number") if isinstance(payload.metadata, dict) else None
+@app.post("/schedule-call", response_model=ScheduledCallOut)
+def schedule_call(request_body: ScheduleCallRequest, settings: Settings = Depends(get_settings)):
+    scheduler = _require_scheduler(settings)
+    data = request_body.model_dump()
+    if data["due_at"] is None:
+        data["due_at"] = time.time()
+    planned = scheduler.schedule(PlannedCall(**data))
+    return _scheduled_call_out(planned)
 
-    if event_type in {"transcript.partial", "transcript.final", "asr.partial", "asr.final"} and payload.transcript:
-        # Load agent prompt/settings
-        system_prompt = ""
-        behavior_settings = {}
-        if config_id is not None:
-            try:
-                cfg = get_supabase(settings).table("agent_config").select("prompt,settings").eq("id", config_id).limit(1).execute()
-                if cfg.data:
-                    system_prompt = cfg.data[0].get("prompt") or ""
-                    behavior_settings = cfg.data[0].get("settings") or {}
-            except Exception:
-                pass
-
-        ctx = ConversationContext(
-            system_prompt=build_system_prompt(system_prompt, ConversationContext(
-                system_prompt="",
-                settings=behavior_settings or {},
-                call_id=str(payload.call_id) if payload.call_id is not None else None,
-                load_number=load_number,
-                driver_name=driver_name,
-            )),
+
+@app.get("/scheduled-calls")
+def get_scheduled_calls(settings: Settings = Depends(get_settings)):
+    scheduler = _require_scheduler(settings)
+    return {
+        "scheduled": [_scheduled_call_out(c) for c in scheduler.pending()],
+        "in_flight": scheduler.in_flight_count(),
+    }
+
+
+@app.delete("/scheduled-calls/{planned_id}")
+def cancel_scheduled_call(planned_id: str, settings: Settings = Depends(get_settings)):
+    scheduler = _require_scheduler(settings)
+    if not scheduler.cancel(planned_id):
+        raise HTTPException(status_code=404, detail="Scheduled call not found")
+    return {"ok": True}
+
+
+def _build_llm(settings: Settings) -> LLMClient | None:
+    if settings.gemini_api_key:
+        return GeminiClient(api_key=settings.gemini_api_key, model=settings.gemini_model)
+    if settings.openai_api_key:
+        return OpenAIClient(api_key=settings.openai_api_key, model=settings.openai_model)
+    return None
+
+
+def _post_reply(settings: Settings, call_id, reply_text: str) -> None:
+    # Send reply back to Retell (placeholder endpoint - adjust per Retell API to send TTS/assistant message)
+    try:
+        get_http_client().post(
+            f"{settings.retell_base_url.rstrip('/')}{settings.retell_reply_path if settings.retell_reply_path.startswith('/') else '/' + settings.retell_reply_path}",
+            headers={
+                "Authorization": f"Bearer {settings.retell_api_key}",
+                "Content-Type": "application/json",
+            },
+            json={
+                "call_id": call_id,
+                "text": reply_text,
+            },
+            timeout=10.0,
+        )
+    except Exception:
+        pass
+
+
+def _run_conversation_turn(settings: Settings, payload: WebhookPayload) -> None:
+    config_id, driver_name, load_number = payload.config_id, payload.driver_name, payload.load_number
+
+    # Load agent prompt/settings
+    system_prompt = ""
+    behavior_settings = {}
+    if config_id is not None:
+        try:
+            cfg = get_supabase(settings).table("agent_config").select("prompt,settings").eq("id", config_id).limit(1).execute()
+            if cfg.data:
+                system_prompt = cfg.data[0].get("prompt") or ""
+                behavior_settings = cfg.data[0].get("settings") or {}
+        except Exception:
+            pass
+
+    ctx = ConversationContext(
+        system_prompt=build_system_prompt(system_prompt, ConversationContext(
+            system_prompt="",
             settings=behavior_settings or {},
             call_id=str(payload.call_id) if payload.call_id is not None else None,
             load_number=load_number,
             driver_name=driver_name,
+        )),
+        settings=behavior_settings or {},
+        call_id=str(payload.call_id) if payload.call_id is not None else None,
+        load_number=load_number,
+        driver_name=driver_name,
+    )
+
+    llm = _build_llm(settings)
+    if llm:
+        reply_text = generate_reply(llm, ctx, payload.transcript)
+        _post_reply(settings, payload.call_id, reply_text)
+        startup_state.mark_first_turn()
+
+
+@app.post("/webhook")
+async def webhook(req: Request, settings: Settings = Depends(get_settings)):
+    # Accepts Retell webhook JSON (event-based). For simplicity, handle text events and final transcript.
+    body = await req.body()
+    started = time.thread_time()
+    try:
+        payload = WebhookPayload.model_validate_json(body)
+    except ValidationError:
+        raise HTTPException(status_code=400, detail="Webhook body must be a JSON object")
+    finally:
+        parse_stats.add(time.thread_time() - started)
+
+    # Retell retries slow deliveries: answer repeats from the first delivery's response
+    dedup = get_event_deduplicator(settings)
+    cached = await dedup.begin(payload)
+    if cached == IN_PROGRESS:
+        # Another worker is still on it and may fail: have Retell retry rather than settle for a 200
+        return FastJSONResponse(
+            cached, status_code=503, headers={"Retry-After": str(IN_PROGRESS_RETRY_AFTER_SECONDS)}
         )
+    if cached is not None:
+        return FastJSONResponse(cached)
+    try:
+        response = await _process_webhook_event(payload, settings)
+    except BaseException as exc:
+        dedup.abort(payload, exc)
+        raise
+    await dedup.complete(payload, response)
+    return FastJSONResponse(response)
 
-        llm: LLMClient | None = None
-        if settings.gemini_api_key:
-            llm = GeminiClient(api_key=settings.gemini_api_key, model=settings.gemini_model)
-        elif settings.openai_api_key:
-            llm = OpenAIClient(api_key=settings.openai_api_key, model=settings.openai_model)
 
-        if llm:
-            reply_text = generate_reply(llm, ctx, payload.transcript)
+async def _process_webhook_event(payload: WebhookPayload, settings: Settings) -> dict:
+    event_type = payload.event_type
 
-            # Send reply back to Retell (placeholder endpoint - adjust per Retell API to send TTS/assistant message)
+    if event_type == "call_ended":
+        # Scheduled calls: free the Retell concurrency slot, and queue a retry if the driver never answered
+        if settings.scheduler_enabled and payload.ended_call_id is not None:
             try:
-                with httpx.Client(timeout=10.0) as client:
-                    client.post(
-                        f"{settings.retell_base_url.rstrip('/')}{settings.retell_reply_path if settings.retell_reply_path.startswith('/') else '/' + settings.retell_reply_path}",
-                        headers={
-                            "Authorization": f"Bearer {settings.retell_api_key}",
-                            "Content-Type": "application/json",
-                        },
-                        json={
-                            "call_id": payload.call_id,
-                            "text": reply_text,
-                        },
-                    )
+                await asyncio.to_thread(
+                    get_scheduler(settings).report_call_ended, str(payload.ended_call_id), payload.ended_reason
+                )
             except Exception:
-                pass
+                logger.exception("Failed to report end of scheduled call %s", payload.ended_call_id)
+        if payload.call_id is None:
+            return {"ok": True}
+
+    supabase = get_supabase(settings)
+    spool = get_call_log_spool(settings)
+
+    # Determine which log row to update (spooled rows first, so unreplayed calls are found)
+    call_log = spool.find_call_log(payload.call_id) if spool is not None else None
+    if call_log is None:
+        call_log_columns = "id,created_at,config_id,structured_summary,summary_version,external_call_id"
+        call_log_query = supabase.table("call_logs").select(call_log_columns).eq("external_call_id", payload.call_id).limit(1)
+        result = call_log_query.execute()
+        rows = result.data or []
+        if not rows and isinstance(payload.call_id, int):
+            # fallback if webhook sends our internal id
+            result = supabase.table("call_logs").select(call_log_columns).eq("id", payload.call_id).limit(1).execute()
+            rows = result.data or []
+        if not rows:
+            raise HTTPException(status_code=404, detail="Call log not found")
+        call_log = spool.remember_call_log(rows[0]) if spool is not None else rows[0]
+    call_log_id = call_log["id"]
+
+    # Live conversation loop (simplified): when we receive an incremental transcript line, generate a reply.
+    # This assumes Retell posts partial transcripts as events with metadata. Adjust to Retell's event schema if needed.
+
+    if event_type in {"transcript.partial", "transcript.final", "asr.partial", "asr.final"} and payload.transcript:
+        priority = classify_priority(event_type, payload.transcript)
+        async with get_admission_controller(settings).slot(priority) as admitted:
+            if admitted:
+                await asyncio.to_thread(_run_conversation_turn, settings, payload)
+            elif priority in DEGRADED_REPLIES and _build_llm(settings) is not None:
+                # Overloaded: speak a short templated reply instead of timing out on the LLM.
+                # Shed partial transcripts skip generation entirely.
+                await asyncio.to_thread(_post_reply, settings, payload.call_id, DEGRADED_REPLIES[priority])
 
     summary = build_structured_summary(payload.transcript)
 
@@ -262,9 +384,35 @@ async def webhook(req: Request, settings: Settings = Depends(get_settings)):
         "transcript": payload.transcript,
         "structured_summary": summary,
     }
-    supabase.table("call_logs").update(update_data).eq("id", call_log_id).execute()
+    if spool is not None:
+        # The analytics counters move when the update is replayed, against the summary Supabase holds then
+        spool.update_call_log(call_log["local_id"], update_data)
+    else:
+        # call_log may be stale after the turn above; the versioned write re-reads it if so
+        await asyncio.to_thread(analytics.update_call_log_summary, supabase, call_log_id, update_data, call_log)
+
+    return {"ok": True, "call_log_id": call_log_id}
+
 
-    return JSONResponse({"ok": True, "call_log_id": call_log_id})
+@app.get("/metrics/serialization")
+def serialization_metrics():
+    return serialization_stats()
+
+
+@app.get("/metrics/dedup")
+def dedup_metrics(settings: Settings = Depends(get_settings)):
+    return get_event_deduplicator(settings).stats.snapshot()
+
+
+@app.get("/metrics/spool")
+def spool_metrics(settings: Settings = Depends(get_settings)):
+    spool = get_call_log_spool(settings)
+    return spool.stats() if spool is not None else {"enabled": False}
+
+
+@app.get("/metrics/admission")
+def admission_metrics(settings: Settings = Depends(get_settings)):
+    return get_admission_controller(settings).stats()
 
 
 @app.post("/webhook/test")
@@ -279,11 +427,47 @@ def get_call_logs(settings: Settings = Depends(get_settings)):
     
     try:
         result = supabase.table("call_logs").select("*").order("created_at", desc=True).execute()
-        return {"messages": result.data or []}
+        rows = result.data or []
+        spool = get_call_log_spool(settings)
+        if spool is not None:
+            rows = spool.merge_rows(rows)
+        # Large payload: encode the rows directly, skipping jsonable_encoder
+        return FastJSONResponse({"messages": rows})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch call logs: {str(e)}")
 
 
+@app.get("/analytics")
+def get_analytics(
+    granularity: str = "hour",
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    config_id: Optional[int] = None,
+    settings: Settings = Depends(get_settings),
+):
+    if granularity not in analytics.GRANULARITY_SECONDS:
+        raise HTTPException(status_code=400, detail=f"granularity must be one of {sorted(analytics.GRANULARITY_SECONDS)}")
+    try:
+        analytics.parse_bounds(since, until)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"since/until must be ISO 8601 timestamps: {e}")
+    supabase = get_supabase(settings)
+    try:
+        return analytics.query(supabase, granularity=granularity, since=since, until=until, config_id=config_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch analytics: {str(e)}")
+
+
+@app.post("/analytics/rebuild")
+def rebuild_analytics(settings: Settings = Depends(get_settings)):
+    supabase = get_supabase(settings)
+    try:
+        calls = analytics.rebuild(supabase)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to rebuild analytics: {str(e)}")
+    return {"ok": True, "calls": calls}
+
+
 @app.get("/webhook/examples")
 def webhook_examples():
     examples = [
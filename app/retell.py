@@ -1,6 +1,8 @@
 from typing import Dict, Any, Optional, List, Tuple
 import httpx
 
+from .http_pool import get_http_client
+
 
 def trigger_retell_call(
     api_key: str,
@@ -69,30 +71,30 @@ def trigger_retell_call(
             payload["voice_overrides"] = overrides
 
     errors: List[Tuple[str, str]] = []
-    with httpx.Client(timeout=30.0) as client:
-        for url in candidates:
+    client = get_http_client()
+    for url in candidates:
+        try:
+            resp = client.post(url, headers=headers, json=payload, timeout=30.0)
+            resp.raise_for_status()
+            return resp.json()
+        except httpx.HTTPStatusError as e:
+            status = e.response.status_code
             try:
-                resp = client.post(url, headers=headers, json=payload)
-                resp.raise_for_status()
-                return resp.json()
-            except httpx.HTTPStatusError as e:
-                status = e.response.status_code
-                try:
-                    body = e.response.json()
-                except Exception:
-                    body = {"text": e.response.text}
-                # For 400, we likely have the right endpoint but missing fields; bubble up immediately for clarity
-                if status == 400:
-                    detail = body.get("detail") or body.get("error_message") or body
-                    raise ValueError(f"Retell AI API error: Bad request - {detail}")
-                if status == 401:
-                    raise ValueError("Invalid Retell AI API key")
-                # Accumulate and continue trying alternatives for 404 etc.
-                errors.append((url, f"{status} - {body}"))
-            except httpx.ConnectError:
-                errors.append((url, "connect-error"))
-            except Exception as e:
-                errors.append((url, f"unexpected-error: {e}"))
+                body = e.response.json()
+            except Exception:
+                body = {"text": e.response.text}
+            # For 400, we likely have the right endpoint but missing fields; bubble up immediately for clarity
+            if status == 400:
+                detail = body.get("detail") or body.get("error_message") or body
+                raise ValueError(f"Retell AI API error: Bad request - {detail}")
+            if status == 401:
+                raise ValueError("Invalid Retell AI API key")
+            # Accumulate and continue trying alternatives for 404 etc.
+            errors.append((url, f"{status} - {body}"))
+        except httpx.ConnectError:
+            errors.append((url, "connect-error"))
+        except Exception as e:
+            errors.append((url, f"unexpected-error: {e}"))
 
     # If we got here, none worked
     attempted = "; ".join([f"{u} => {err}" for u, err in errors[:4]])
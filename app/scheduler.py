@@ -0,0 +1,559 @@
+from __future__ import annotations
+
+import heapq
+import logging
+import math
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass, field, asdict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .calls import CallPlacementError, place_call
+from .db import get_supabase
+from .settings import Settings
+
+
+logger = logging.getLogger(__name__)
+
+# Retell disconnection reasons that mean the driver never picked up
+NO_ANSWER_REASONS = {"dial_no_answer", "dial_busy", "voicemail_reached", "dial_failed"}
+
+_SECONDS_PER_DAY = 86400
+
+
+@dataclass
+class PlannedCall:
+    driver_name: str
+    phone_number: str
+    load_number: str
+    config_id: int
+    due_at: float
+    # Recurring check calls re-arm at slot_at + interval_seconds after each placement
+    interval_seconds: Optional[int] = None
+    # Local quiet window in whole hours [start, end); may wrap past midnight
+    quiet_hours_start: Optional[int] = None
+    quiet_hours_end: Optional[int] = None
+    utc_offset_minutes: int = 0
+    attempt: int = 0
+    slot_at: Optional[float] = None
+    last_error: Optional[str] = None
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+
+    @property
+    def driver_key(self) -> str:
+        return "".join(ch for ch in self.phone_number if ch.isdigit() or ch == "+")
+
+    def to_row(self) -> Dict[str, Any]:
+        row = asdict(self)
+        # Unique in the store: one pending entry per driver across all workers
+        row["driver_key"] = self.driver_key
+        return row
+
+    @classmethod
+    def from_row(cls, row: Dict[str, Any]) -> "PlannedCall":
+        known = set(cls.__dataclass_fields__)
+        return cls(**{k: v for k, v in row.items() if k in known})
+
+
+class ScheduleStore(ABC):
+    """Shared scheduler state: the queue, calls in flight, and the lease naming the worker that places calls."""
+
+    @abstractmethod
+    def load(self) -> List[Dict[str, Any]]: ...
+
+    @abstractmethod
+    def save(self, row: Dict[str, Any]) -> None: ...
+
+    @abstractmethod
+    def delete(self, planned_id: str) -> bool: ...
+
+    @abstractmethod
+    def merge(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        """Atomically insert ``row``, or pull the driver's existing entry forward to its due time."""
+
+    @abstractmethod
+    def acquire_lease(self, holder: str, ttl_seconds: float) -> bool:
+        """Take or renew the scheduler lease; False while another holder's lease is live."""
+
+    @abstractmethod
+    def add_in_flight(self, external_call_id: str, row: Dict[str, Any], started_at: float) -> None: ...
+
+    @abstractmethod
+    def load_in_flight(self) -> List[Dict[str, Any]]: ...
+
+    @abstractmethod
+    def mark_ended(self, external_call_id: str, reason: Optional[str]) -> bool: ...
+
+    @abstractmethod
+    def remove_in_flight(self, external_call_id: str) -> None: ...
+
+
+class MemoryScheduleStore(ScheduleStore):
+    def __init__(self, clock: Callable[[], float] = time.time) -> None:
+        self.clock = clock
+        self.rows: Dict[str, Dict[str, Any]] = {}
+        self.in_flight: Dict[str, Dict[str, Any]] = {}
+        self.lease: Optional[Tuple[str, float]] = None
+        self._lock = threading.Lock()
+
+    def load(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [dict(row) for row in self.rows.values()]
+
+    def save(self, row: Dict[str, Any]) -> None:
+        with self._lock:
+            self.rows[row["id"]] = dict(row)
+
+    def delete(self, planned_id: str) -> bool:
+        with self._lock:
+            return self.rows.pop(planned_id, None) is not None
+
+    def merge(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            existing = next((r for r in self.rows.values() if r["driver_key"] == row["driver_key"]), None)
+            if existing is None:
+                existing = self.rows[row["id"]] = dict(row)
+            else:
+                existing["due_at"] = min(existing["due_at"], row["due_at"])
+            return dict(existing)
+
+    def acquire_lease(self, holder: str, ttl_seconds: float) -> bool:
+        with self._lock:
+            now = self.clock()
+            if self.lease is not None and self.lease[0] != holder and self.lease[1] > now:
+                return False
+            self.lease = (holder, now + ttl_seconds)
+            return True
+
+    def add_in_flight(self, external_call_id: str, row: Dict[str, Any], started_at: float) -> None:
+        with self._lock:
+            self.in_flight[external_call_id] = {
+                "external_call_id": external_call_id,
+                "call": dict(row),
+                "started_at": started_at,
+                "ended": False,
+                "ended_reason": None,
+            }
+
+    def load_in_flight(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [dict(entry) for entry in self.in_flight.values()]
+
+    def mark_ended(self, external_call_id: str, reason: Optional[str]) -> bool:
+        with self._lock:
+            entry = self.in_flight.get(external_call_id)
+            if entry is None:
+                return False
+            entry.update(ended=True, ended_reason=reason)
+            return True
+
+    def remove_in_flight(self, external_call_id: str) -> None:
+        with self._lock:
+            self.in_flight.pop(external_call_id, None)
+
+
+class SupabaseScheduleStore(ScheduleStore):
+    # Tables and functions are in the README: scheduled_calls, scheduler_in_flight, scheduler_leases
+    table = "scheduled_calls"
+    in_flight_table = "scheduler_in_flight"
+    lease_name = "call_scheduler"
+    page_size = 1000
+
+    def __init__(self, supabase: Any) -> None:
+        self.supabase = supabase
+
+    def _select_all(self, table: str) -> List[Dict[str, Any]]:
+        # PostgREST caps each response (1000 rows by default), so read in pages
+        rows: List[Dict[str, Any]] = []
+        while True:
+            start = len(rows)
+            result = self.supabase.table(table).select("*").range(start, start + self.page_size - 1).execute()
+            page = result.data or []
+            rows.extend(page)
+            if len(page) < self.page_size:
+                return rows
+
+    def load(self) -> List[Dict[str, Any]]:
+        return self._select_all(self.table)
+
+    def save(self, row: Dict[str, Any]) -> None:
+        self.supabase.table(self.table).upsert(row).execute()
+
+    def delete(self, planned_id: str) -> bool:
+        result = self.supabase.table(self.table).delete().eq("id", planned_id).execute()
+        return bool(result.data)
+
+    def merge(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        result = self.supabase.rpc("schedule_call", {"call": row}).execute()
+        data = result.data
+        return data[0] if isinstance(data, list) else data
+
+    def acquire_lease(self, holder: str, ttl_seconds: float) -> bool:
+        result = self.supabase.rpc(
+            "acquire_scheduler_lease",
+            {"lease_name": self.lease_name, "lease_holder": holder, "ttl_seconds": ttl_seconds},
+        ).execute()
+        return bool(result.data)
+
+    def add_in_flight(self, external_call_id: str, row: Dict[str, Any], started_at: float) -> None:
+        self.supabase.table(self.in_flight_table).upsert(
+            {"external_call_id": external_call_id, "call": row, "started_at": started_at}
+        ).execute()
+
+    def load_in_flight(self) -> List[Dict[str, Any]]:
+        return self._select_all(self.in_flight_table)
+
+    def mark_ended(self, external_call_id: str, reason: Optional[str]) -> bool:
+        result = (
+            self.supabase.table(self.in_flight_table)
+            .update({"ended": True, "ended_reason": reason})
+            .eq("external_call_id", external_call_id)
+            .execute()
+        )
+        return bool(result.data)
+
+    def remove_in_flight(self, external_call_id: str) -> None:
+        self.supabase.table(self.in_flight_table).delete().eq("external_call_id", external_call_id).execute()
+
+
+class RateLimiter:
+    """Token bucket: refills ``rate_per_minute`` tokens per minute, holds at most ``burst``."""
+
+    def __init__(self, rate_per_minute: float, burst: int, clock: Callable[[], float] = time.time) -> None:
+        self.rate_per_second = max(rate_per_minute, 0.0) / 60.0
+        self.burst = max(burst, 1)
+        self.clock = clock
+        self.tokens = float(self.burst)
+        self.updated_at = clock()
+
+    def _refill(self) -> None:
+        now = self.clock()
+        elapsed = max(now - self.updated_at, 0.0)
+        self.tokens = min(float(self.burst), self.tokens + elapsed * self.rate_per_second)
+        self.updated_at = now
+
+    def try_acquire(self) -> bool:
+        self._refill()
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True
+        return False
+
+
+@dataclass
+class _InFlight:
+    call: PlannedCall
+    started_at: float
+
+
+def defer_for_quiet_hours(call: PlannedCall, ts: float) -> float:
+    if call.quiet_hours_start is None or call.quiet_hours_end is None:
+        return ts
+    start = (call.quiet_hours_start % 24) * 3600
+    end = (call.quiet_hours_end % 24) * 3600
+    if start == end:
+        return ts
+    local_secs = (ts + call.utc_offset_minutes * 60) % _SECONDS_PER_DAY
+    if start < end:
+        in_window = start <= local_secs < end
+    else:
+        in_window = local_secs >= start or local_secs < end
+    if not in_window:
+        return ts
+    return ts + (end - local_secs) % _SECONDS_PER_DAY
+
+
+class CallScheduler:
+    """Priority queue of planned calls, drained by ``run_due`` under a global rate limit.
+
+    The queue and the calls in flight live in the store, which every worker
+    shares. Any worker can schedule, cancel or report a call ending; only the
+    worker holding the store's lease places calls, so the rate limit and the
+    concurrency cap hold across processes. The lease holder reloads the store
+    at the start of each tick.
+
+    One pending entry is kept per driver; scheduling again for the same driver
+    merges into it and the earliest due time wins. Failed placements and
+    no-answer outcomes are retried with exponential backoff.
+    """
+
+    def __init__(
+        self,
+        place: Callable[[PlannedCall], Dict[str, Any]],
+        store: Optional[ScheduleStore] = None,
+        clock: Callable[[], float] = time.time,
+        rate_per_minute: float = 10.0,
+        burst: int = 1,
+        max_concurrent: int = 10,
+        max_call_seconds: int = 900,
+        max_attempts: int = 3,
+        retry_base_seconds: int = 60,
+        retry_max_seconds: int = 1800,
+        lease_seconds: float = 120.0,
+        holder_id: Optional[str] = None,
+    ) -> None:
+        self.place = place
+        self.store = store or MemoryScheduleStore(clock)
+        self.clock = clock
+        self.limiter = RateLimiter(rate_per_minute, burst, clock)
+        self.max_concurrent = max_concurrent
+        self.max_call_seconds = max_call_seconds
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self.lease_seconds = lease_seconds
+        self.holder_id = holder_id or uuid.uuid4().hex
+
+        self._lock = threading.Lock()
+        self._heap: List[Tuple[float, int, str]] = []
+        self._seq = 0
+        self._pending: Dict[str, PlannedCall] = {}
+        self._by_driver: Dict[str, str] = {}
+        self._in_flight: "OrderedDict[str, _InFlight]" = OrderedDict()
+
+    # -- queue maintenance (callers hold the lock) --
+
+    def _index(self, call: PlannedCall) -> None:
+        self._pending[call.id] = call
+        self._by_driver[call.driver_key] = call.id
+        self._seq += 1
+        heapq.heappush(self._heap, (call.due_at, self._seq, call.id))
+
+    def _push(self, call: PlannedCall) -> None:
+        call.due_at = defer_for_quiet_hours(call, call.due_at)
+        self._index(call)
+        self.store.save(call.to_row())
+
+    def _forget(self, call: PlannedCall) -> None:
+        self._pending.pop(call.id, None)
+        if self._by_driver.get(call.driver_key) == call.id:
+            self._by_driver.pop(call.driver_key, None)
+
+    def _remove(self, call: PlannedCall) -> None:
+        self._forget(call)
+        self.store.delete(call.id)
+
+    def _backoff(self, attempt: int) -> float:
+        return float(min(self.retry_max_seconds, self.retry_base_seconds * (2 ** max(attempt - 1, 0))))
+
+    def _expire_in_flight(self, now: float) -> None:
+        # Calls whose end event never arrived stop counting against concurrency
+        while self._in_flight:
+            ext_id, entry = next(iter(self._in_flight.items()))
+            if now - entry.started_at < self.max_call_seconds:
+                break
+            self._in_flight.pop(ext_id)
+            self.store.remove_in_flight(ext_id)
+
+    def _retry(self, call: PlannedCall, reason: str) -> Optional[PlannedCall]:
+        now = self.clock()
+        attempt = call.attempt + 1
+        existing_id = self._by_driver.get(call.driver_key)
+        existing = self._pending.get(existing_id) if existing_id else None
+
+        if attempt >= self.max_attempts:
+            logger.warning("Giving up on call to %s after %d attempts: %s", call.driver_key, attempt, reason)
+            if existing is None or existing.id != call.id:
+                return None
+            if existing.interval_seconds and existing.slot_at is not None:
+                # Recurring: fall back to the next regular slot
+                existing.attempt = 0
+                existing.due_at = existing.slot_at
+                existing.last_error = reason
+                self._push(existing)
+                return existing
+            self._remove(existing)
+            return None
+
+        retry_at = now + self._backoff(attempt)
+        if existing is not None:
+            # Merge into the driver's pending entry (e.g. the next recurrence)
+            if existing.due_at <= retry_at:
+                return existing
+            existing.due_at = retry_at
+            existing.attempt = attempt
+            existing.last_error = reason
+            self._push(existing)
+            return existing
+
+        retry = PlannedCall.from_row({**call.to_row(), "attempt": attempt, "last_error": reason})
+        retry.due_at = defer_for_quiet_hours(retry, retry_at)
+        # Merge in the store: another worker may have scheduled this driver since the last sync
+        retry = PlannedCall.from_row(self.store.merge(retry.to_row()))
+        self._index(retry)
+        return retry
+
+    # -- public API (any worker) --
+
+    def schedule(self, call: PlannedCall) -> PlannedCall:
+        if call.slot_at is None:
+            call.slot_at = call.due_at
+        call.due_at = defer_for_quiet_hours(call, call.due_at)
+        # Store only: the lease holder picks the entry up on its next sync
+        return PlannedCall.from_row(self.store.merge(call.to_row()))
+
+    def cancel(self, planned_id: str) -> bool:
+        return self.store.delete(planned_id)
+
+    def pending(self) -> List[PlannedCall]:
+        return sorted((PlannedCall.from_row(row) for row in self.store.load()), key=lambda c: c.due_at)
+
+    def in_flight_count(self) -> int:
+        now = self.clock()
+        return sum(
+            1
+            for entry in self.store.load_in_flight()
+            if not entry.get("ended") and now - entry["started_at"] < self.max_call_seconds
+        )
+
+    def report_call_ended(self, external_call_id: str, disconnection_reason: Optional[str] = None) -> bool:
+        """Record that a scheduled call ended; the lease holder frees its slot (and retries a no-answer) next tick."""
+        return self.store.mark_ended(str(external_call_id), disconnection_reason)
+
+    # -- placement (lease holder only) --
+
+    def hold_lease(self) -> bool:
+        return self.store.acquire_lease(self.holder_id, self.lease_seconds)
+
+    def sync(self) -> int:
+        """Rebuild the local queue from the store and apply call endings reported by any worker."""
+        rows = self.store.load()
+        in_flight = self.store.load_in_flight()
+        with self._lock:
+            self._heap, self._pending, self._by_driver = [], {}, {}
+            for row in rows:
+                self._index(PlannedCall.from_row(row))
+            self._in_flight = OrderedDict()
+            for entry in sorted(in_flight, key=lambda e: e["started_at"]):
+                ext_id = str(entry["external_call_id"])
+                call = PlannedCall.from_row(entry["call"])
+                if entry.get("ended"):
+                    if entry.get("ended_reason") in NO_ANSWER_REASONS:
+                        self._retry(call, entry["ended_reason"])
+                    self.store.remove_in_flight(ext_id)
+                    continue
+                self._in_flight[ext_id] = _InFlight(call=call, started_at=entry["started_at"])
+            self._expire_in_flight(self.clock())
+            return len(self._pending)
+
+    def _pop_due(self) -> Optional[PlannedCall]:
+        with self._lock:
+            now = self.clock()
+            self._expire_in_flight(now)
+            while self._heap:
+                due_at, _, planned_id = self._heap[0]
+                call = self._pending.get(planned_id)
+                if call is None or call.due_at != due_at:
+                    heapq.heappop(self._heap)  # stale heap entry
+                    continue
+                if due_at > now:
+                    return None
+                if len(self._in_flight) >= self.max_concurrent or not self.limiter.try_acquire():
+                    return None
+                heapq.heappop(self._heap)
+                placed = PlannedCall.from_row(call.to_row())
+                if call.interval_seconds and call.slot_at is not None:
+                    # Re-arm the recurring entry at its next slot. A retry (or an earlier
+                    # ad-hoc request) popped ahead of slot_at leaves the slot where it is.
+                    if call.due_at >= call.slot_at:
+                        # Skip the slots missed while late (downtime, backlog, quiet hours):
+                        # the next one is strictly in the future, never due again at once
+                        missed = math.floor((now - call.slot_at) / call.interval_seconds) + 1
+                        call.slot_at = defer_for_quiet_hours(call, call.slot_at + call.interval_seconds * max(missed, 1))
+                    call.due_at = call.slot_at
+                    call.attempt = 0
+                    call.last_error = None
+                    self._push(call)
+                else:
+                    self._remove(call)
+                return placed
+            return None
+
+    def _place(self, call: PlannedCall) -> Dict[str, Any]:
+        try:
+            result = self.place(call)
+        except CallPlacementError as exc:
+            # Only upstream Retell failures are transient; bad config or a failed log write are not
+            if exc.status_code == 502:
+                with self._lock:
+                    self._retry(call, exc.detail)
+            return {"id": call.id, "ok": False, "error": exc.detail}
+        except Exception as exc:
+            with self._lock:
+                self._retry(call, str(exc))
+            return {"id": call.id, "ok": False, "error": str(exc)}
+
+        external_call_id = result.get("external_call_id")
+        if external_call_id:
+            started_at = self.clock()
+            with self._lock:
+                self._in_flight[str(external_call_id)] = _InFlight(call=call, started_at=started_at)
+            self.store.add_in_flight(str(external_call_id), call.to_row(), started_at)
+        return {"id": call.id, "ok": True, **result}
+
+    def run_due(self) -> List[Dict[str, Any]]:
+        """Place every due call the rate limit allows right now; returns per-call outcomes.
+
+        A no-op unless this worker holds (or can take) the scheduler lease.
+        """
+        if not self.hold_lease():
+            return []
+        self.sync()
+        outcomes: List[Dict[str, Any]] = []
+        while True:
+            call = self._pop_due()
+            if call is None:
+                return outcomes
+            outcomes.append(self._place(call))
+            # Renew between placements; stop if the lease was lost to another worker
+            if not self.hold_lease():
+                return outcomes
+
+
+_scheduler: Optional[CallScheduler] = None
+
+
+def get_scheduler(settings: Settings) -> CallScheduler:
+    global _scheduler
+    if _scheduler is not None:
+        return _scheduler
+    supabase = get_supabase(settings)
+
+    def _place(call: PlannedCall) -> Dict[str, Any]:
+        return place_call(
+            supabase,
+            settings,
+            driver_name=call.driver_name,
+            phone_number=call.phone_number,
+            load_number=call.load_number,
+            config_id=call.config_id,
+        )
+
+    _scheduler = CallScheduler(
+        place=_place,
+        store=SupabaseScheduleStore(supabase),
+        rate_per_minute=settings.retell_calls_per_minute,
+        burst=settings.retell_call_burst,
+        max_concurrent=settings.retell_max_concurrent_calls,
+        max_attempts=settings.scheduler_max_attempts,
+        retry_base_seconds=settings.scheduler_retry_base_seconds,
+        retry_max_seconds=settings.scheduler_retry_max_seconds,
+        lease_seconds=settings.scheduler_lease_seconds,
+    )
+    return _scheduler
+
+
+__all__ = [
+    "PlannedCall",
+    "ScheduleStore",
+    "MemoryScheduleStore",
+    "SupabaseScheduleStore",
+    "RateLimiter",
+    "CallScheduler",
+    "defer_for_quiet_hours",
+    "get_scheduler",
+    "NO_ANSWER_REASONS",
+]
@@ -1,5 +1,5 @@
 from typing import Optional, Any, Dict
-from pydantic import BaseModel, Field
+from pydantic import AliasChoices, BaseModel, ConfigDict, Field, field_validator
 
 
 class AgentConfigIn(BaseModel):
@@ -10,6 +10,8 @@ class AgentConfigIn(BaseModel):
 
 
 class AgentConfigOut(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+
     id: int
     name: str
     prompt: str
@@ -25,14 +27,113 @@ class StartCallRequest(BaseModel):
 
 
 class StartCallResponse(BaseModel):
-    call_id: int
+    # Provisional "local-..." id while the call log is still spooled
+    call_id: int | str
     external_call_id: Optional[str] = None
 
 
+class ScheduleCallRequest(BaseModel):
+    driver_name: str
+    phone_number: str
+    load_number: str
+    config_id: int
+    # Unix timestamp; defaults to now
+    due_at: Optional[float] = None
+    interval_seconds: Optional[int] = Field(default=None, gt=0)
+    quiet_hours_start: Optional[int] = Field(default=None, ge=0, le=23)
+    quiet_hours_end: Optional[int] = Field(default=None, ge=0, le=23)
+    utc_offset_minutes: int = 0
+
+
+class ScheduledCallOut(BaseModel):
+    id: str
+    driver_name: str
+    phone_number: str
+    load_number: str
+    config_id: int
+    due_at: float
+    interval_seconds: Optional[int] = None
+    quiet_hours_start: Optional[int] = None
+    quiet_hours_end: Optional[int] = None
+    utc_offset_minutes: int = 0
+    attempt: int = 0
+    last_error: Optional[str] = None
+
+
 class WebhookPayload(BaseModel):
+    """One lenient model for every Retell webhook event.
+
+    Parsed once, straight from the raw request bytes; fields with unexpected
+    types are coerced to their empty value instead of failing validation.
+    """
+
+    model_config = ConfigDict(extra="ignore")
+
+    event: Optional[str] = None
+    type: Optional[str] = None
     call_id: Optional[str | int] = None
-    transcript: str
+    # Delivery identity, when Retell sends one; used for idempotent processing
+    event_id: Optional[str] = Field(default=None, validation_alias=AliasChoices("event_id", "id"))
+    sequence: Optional[int] = Field(default=None, validation_alias=AliasChoices("sequence", "sequence_number", "seq"))
+    transcript: str = ""
     metadata: Dict[str, Any] = Field(default_factory=dict)
+    # call_ended events nest call details under "call"
+    call: Dict[str, Any] = Field(default_factory=dict)
+    disconnection_reason: Optional[str] = None
+
+    @field_validator("event", "type", "disconnection_reason", mode="before")
+    @classmethod
+    def _optional_str(cls, v: Any) -> Optional[str]:
+        return v if isinstance(v, str) else None
+
+    @field_validator("call_id", mode="before")
+    @classmethod
+    def _call_id(cls, v: Any) -> Optional[str | int]:
+        return v if isinstance(v, (str, int)) and not isinstance(v, bool) else None
+
+    @field_validator("event_id", mode="before")
+    @classmethod
+    def _event_id(cls, v: Any) -> Optional[str]:
+        return str(v) if isinstance(v, (str, int)) and not isinstance(v, bool) else None
+
+    @field_validator("sequence", mode="before")
+    @classmethod
+    def _sequence(cls, v: Any) -> Optional[int]:
+        return v if isinstance(v, int) and not isinstance(v, bool) else None
+
+    @field_validator("transcript", mode="before")
+    @classmethod
+    def _transcript(cls, v: Any) -> str:
+        return v if isinstance(v, str) else ""
+
+    @field_validator("metadata", "call", mode="before")
+    @classmethod
+    def _mapping(cls, v: Any) -> Dict[str, Any]:
+        return v if isinstance(v, dict) else {}
+
+    @property
+    def event_type(self) -> Optional[str]:
+        return self.event or self.type
+
+    @property
+    def config_id(self) -> Any:
+        return self.metadata.get("config_id")
+
+    @property
+    def driver_name(self) -> Optional[str]:
+        return self.metadata.get("driver_name")
+
+    @property
+    def load_number(self) -> Optional[str]:
+        return self.metadata.get("load_number")
+
+    @property
+    def ended_call_id(self) -> Optional[str | int]:
+        return self.call.get("call_id") or self.call_id
+
+    @property
+    def ended_reason(self) -> Optional[str]:
+        return self.call.get("disconnection_reason") or self.disconnection_reason
 
 
 class WebhookTestRequest(BaseModel):
@@ -26,6 +26,46 @@ class Settings(BaseModel):
     gemini_api_key: str = Field(default_factory=lambda: os.getenv("GEMINI_API_KEY", ""))
     gemini_model: str = Field(default_factory=lambda: os.getenv("GEMINI_MODEL", "gemini-1.5-flash"))
 
+    # Call scheduler (recurring check calls, retries, pacing)
+    scheduler_enabled: bool = Field(default_factory=lambda: os.getenv("SCHEDULER_ENABLED", "true").lower() in {"1", "true", "yes"})
+    scheduler_tick_seconds: float = Field(default_factory=lambda: float(os.getenv("SCHEDULER_TICK_SECONDS", "5")))
+    scheduler_max_attempts: int = Field(default_factory=lambda: int(os.getenv("SCHEDULER_MAX_ATTEMPTS", "3")))
+    scheduler_retry_base_seconds: int = Field(default_factory=lambda: int(os.getenv("SCHEDULER_RETRY_BASE_SECONDS", "60")))
+    scheduler_retry_max_seconds: int = Field(default_factory=lambda: int(os.getenv("SCHEDULER_RETRY_MAX_SECONDS", "1800")))
+    # Only the worker holding the lease places calls; must outlast the slowest single placement
+    scheduler_lease_seconds: float = Field(default_factory=lambda: float(os.getenv("SCHEDULER_LEASE_SECONDS", "120")))
+    # Keep these within the Retell account's concurrency quota
+    retell_calls_per_minute: float = Field(default_factory=lambda: float(os.getenv("RETELL_CALLS_PER_MINUTE", "10")))
+    retell_call_burst: int = Field(default_factory=lambda: int(os.getenv("RETELL_CALL_BURST", "1")))
+    retell_max_concurrent_calls: int = Field(default_factory=lambda: int(os.getenv("RETELL_MAX_CONCURRENT_CALLS", "10")))
+
+    # Webhook admission control (per worker process)
+    webhook_max_in_flight: int = Field(default_factory=lambda: int(os.getenv("WEBHOOK_MAX_IN_FLIGHT", "8")))
+    webhook_max_queue: int = Field(default_factory=lambda: int(os.getenv("WEBHOOK_MAX_QUEUE", "64")))
+    webhook_max_wait_seconds: float = Field(default_factory=lambda: float(os.getenv("WEBHOOK_MAX_WAIT_SECONDS", "2.0")))
+    # Webhook delivery deduplication: a per-worker index, backed by the shared webhook_deliveries table
+    webhook_dedup_ttl_seconds: float = Field(default_factory=lambda: float(os.getenv("WEBHOOK_DEDUP_TTL_SECONDS", "600")))
+    webhook_dedup_max_entries: int = Field(default_factory=lambda: int(os.getenv("WEBHOOK_DEDUP_MAX_ENTRIES", "10000")))
+    webhook_dedup_shared: bool = Field(default_factory=lambda: os.getenv("WEBHOOK_DEDUP_SHARED", "true").lower() in {"1", "true", "yes"})
+    # Must outlast the slowest webhook turn, or a retry on another worker may process it again
+    webhook_dedup_claim_timeout_seconds: float = Field(default_factory=lambda: float(os.getenv("WEBHOOK_DEDUP_CLAIM_TIMEOUT_SECONDS", "120")))
+    # Deadline per shared-index call, and the breaker that stops a slow Supabase from delaying every webhook
+    webhook_dedup_shared_timeout_seconds: float = Field(default_factory=lambda: float(os.getenv("WEBHOOK_DEDUP_SHARED_TIMEOUT_SECONDS", "1.0")))
+    webhook_dedup_breaker_failures: int = Field(default_factory=lambda: int(os.getenv("WEBHOOK_DEDUP_BREAKER_FAILURES", "3")))
+    webhook_dedup_breaker_cooldown_seconds: float = Field(default_factory=lambda: float(os.getenv("WEBHOOK_DEDUP_BREAKER_COOLDOWN_SECONDS", "30")))
+
+    # Local write-ahead spool for call_logs writes; keep spool_path on a persistent volume
+    spool_enabled: bool = Field(default_factory=lambda: os.getenv("SPOOL_ENABLED", "true").lower() in {"1", "true", "yes"})
+    spool_path: str = Field(default_factory=lambda: os.getenv("SPOOL_PATH", ".spool/call_logs.sqlite3"))
+    spool_replay_interval_seconds: float = Field(default_factory=lambda: float(os.getenv("SPOOL_REPLAY_INTERVAL_SECONDS", "1")))
+    spool_replay_max_backoff_seconds: float = Field(default_factory=lambda: float(os.getenv("SPOOL_REPLAY_MAX_BACKOFF_SECONDS", "60")))
+    spool_batch_size: int = Field(default_factory=lambda: int(os.getenv("SPOOL_BATCH_SIZE", "100")))
+    spool_retention_seconds: float = Field(default_factory=lambda: float(os.getenv("SPOOL_RETENTION_SECONDS", "86400")))
+    # Ops failing for a non-transient reason this many times move to the dead_ops table
+    spool_max_attempts: int = Field(default_factory=lambda: int(os.getenv("SPOOL_MAX_ATTEMPTS", "5")))
+    # Workers sharing spool_path take turns replaying it; must outlast the slowest replay batch
+    spool_replay_lease_seconds: float = Field(default_factory=lambda: float(os.getenv("SPOOL_REPLAY_LEASE_SECONDS", "300")))
+
 
 @lru_cache(maxsize=1)
 def get_settings() -> "Settings":
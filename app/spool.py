@@ -0,0 +1,440 @@
+from __future__ import annotations
+
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from . import analytics
+from .fastjson import dumps, loads
+from .settings import Settings
+
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+create table if not exists call_logs (
+    local_id text primary key,
+    remote_id integer,
+    external_call_id text,
+    data text not null,
+    updated_at real not null,
+    -- set when the row's insert was dead-lettered; its later updates go straight to dead_ops
+    dead_at real
+);
+create index if not exists call_logs_external on call_logs (external_call_id);
+create index if not exists call_logs_remote on call_logs (remote_id);
+create table if not exists ops (
+    seq integer primary key autoincrement,
+    kind text not null,
+    local_id text,
+    payload text not null,
+    created_at real not null,
+    attempts integer not null default 0,
+    last_error text
+);
+create table if not exists dead_ops (
+    seq integer primary key,
+    kind text not null,
+    local_id text,
+    payload text not null,
+    created_at real not null,
+    attempts integer not null,
+    last_error text,
+    dead_at real not null
+);
+create table if not exists replay_lease (
+    name text primary key,
+    holder text not null,
+    expires_at real not null
+);
+"""
+
+# SQLSTATE classes worth retrying: connection, transaction rollback, resources, operator intervention, system
+_TRANSIENT_SQLSTATE_CLASSES = {"08", "40", "53", "57", "58"}
+
+
+def is_transient(exc: BaseException) -> bool:
+    """Whether a replay failure may succeed unchanged later (network, overload, contention)."""
+    if isinstance(exc, (httpx.TransportError, OSError, analytics.SummaryConflict)):
+        # OSError covers ConnectionError and TimeoutError
+        return True
+    code = str(getattr(exc, "code", None) or "")
+    if code.isdigit() and len(code) == 3:
+        # HTTP status from a gateway in front of PostgREST
+        return code == "429" or code >= "500"
+    return len(code) == 5 and code[:2] in _TRANSIENT_SQLSTATE_CLASSES
+
+
+class CallLogSpool:
+    """Durable local write-ahead log for call_logs writes, replayed to Supabase in order.
+
+    Every insert/update is committed to SQLite first and mirrored in a local
+    ``call_logs`` table, so the request path never waits on Supabase. Spooled
+    rows carry a provisional ``local-...`` id until their insert is replayed;
+    after that the mirror records the Supabase id and later updates target it.
+
+    Worker processes may share one spool file; only the holder of the
+    ``replay_lease`` row replays it. An op failing for a non-transient reason
+    ``max_attempts`` times moves to ``dead_ops`` (with every op of its call
+    log, if it is the insert) so it no longer blocks the ops behind it.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        clock=time.time,
+        max_attempts: int = 5,
+        lease_seconds: float = 300.0,
+        holder_id: Optional[str] = None,
+    ) -> None:
+        self.path = path
+        self.clock = clock
+        self.max_attempts = max(max_attempts, 1)
+        self.lease_seconds = lease_seconds
+        self.holder_id = holder_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        # Other workers hold the write lock briefly; wait for it rather than fail
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("pragma journal_mode=wal")
+        self._conn.execute("pragma synchronous=full")
+        self._conn.executescript(_SCHEMA)
+        self._migrate()
+        self.replayed = 0
+        self.last_error: Optional[str] = None
+
+    def _migrate(self) -> None:
+        # Spool files written before call_logs.dead_at existed
+        self._conn.execute("begin immediate")
+        try:
+            columns = {row["name"] for row in self._conn.execute("pragma table_info(call_logs)")}
+            if "dead_at" not in columns:
+                self._conn.execute("alter table call_logs add column dead_at real")
+            self._conn.execute("commit")
+        except BaseException:
+            self._conn.execute("rollback")
+            raise
+
+    # -- local writes (request path) --
+
+    def _row_out(self, row: sqlite3.Row) -> Dict[str, Any]:
+        data = loads(row["data"])
+        data["id"] = row["remote_id"] if row["remote_id"] is not None else row["local_id"]
+        data["local_id"] = row["local_id"]
+        return data
+
+    def _enqueue(self, kind: str, local_id: Optional[str], payload: Any) -> int:
+        cur = self._conn.execute(
+            "insert into ops (kind, local_id, payload, created_at) values (?, ?, ?, ?)",
+            (kind, local_id, dumps(payload), self.clock()),
+        )
+        return cur.lastrowid
+
+    def insert_call_log(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        local_id = f"local-{uuid.uuid4().hex}"
+        row = dict(data)
+        # Stamp created_at here so the Supabase row (and its analytics bucket) match the local one
+        row.setdefault("created_at", datetime.fromtimestamp(self.clock(), tz=timezone.utc).isoformat())
+        with self._lock:
+            self._conn.execute("begin immediate")
+            try:
+                self._conn.execute(
+                    "insert into call_logs (local_id, external_call_id, data, updated_at) values (?, ?, ?, ?)",
+                    (local_id, row.get("external_call_id"), dumps(row), self.clock()),
+                )
+                self._enqueue("insert", local_id, row)
+                self._conn.execute("commit")
+            except BaseException:
+                self._conn.execute("rollback")
+                raise
+        return {**row, "id": local_id, "local_id": local_id}
+
+    def remember_call_log(self, remote_row: Dict[str, Any]) -> Dict[str, Any]:
+        """Mirror a row read from Supabase so later updates can be spooled against it."""
+        local_id = f"remote-{remote_row['id']}"
+        data = {k: v for k, v in remote_row.items() if k not in ("id", "local_id")}
+        with self._lock:
+            self._conn.execute(
+                "insert or ignore into call_logs (local_id, remote_id, external_call_id, data, updated_at) values (?, ?, ?, ?, ?)",
+                (local_id, remote_row["id"], remote_row.get("external_call_id"), dumps(data), self.clock()),
+            )
+            row = self._conn.execute("select * from call_logs where local_id = ?", (local_id,)).fetchone()
+        return self._row_out(row)
+
+    def find_call_log(self, call_id: Any) -> Optional[Dict[str, Any]]:
+        """Look a row up by external call id, provisional local id, or Supabase id."""
+        with self._lock:
+            row = self._conn.execute(
+                "select * from call_logs where external_call_id = ? or local_id = ? order by updated_at desc limit 1",
+                (str(call_id), str(call_id)),
+            ).fetchone()
+            if row is None and isinstance(call_id, int):
+                row = self._conn.execute("select * from call_logs where remote_id = ?", (call_id,)).fetchone()
+        return self._row_out(row) if row is not None else None
+
+    def update_call_log(self, local_id: str, update_data: Dict[str, Any]) -> None:
+        with self._lock:
+            self._conn.execute("begin immediate")
+            try:
+                row = self._conn.execute("select data, dead_at from call_logs where local_id = ?", (local_id,)).fetchone()
+                if row is None:
+                    raise KeyError(f"Unknown spooled call log {local_id}")
+                data = {**loads(row["data"]), **update_data}
+                self._conn.execute(
+                    "update call_logs set data = ?, updated_at = ? where local_id = ?",
+                    (dumps(data), self.clock(), local_id),
+                )
+                seq = self._enqueue("update", local_id, update_data)
+                if row["dead_at"] is not None:
+                    # Its insert never reached Supabase: kept for recovery, never replayed
+                    self._move_to_dead("seq = ?", (seq,), f"Insert of call log {local_id} was dead-lettered")
+                self._conn.execute("commit")
+            except BaseException:
+                self._conn.execute("rollback")
+                raise
+
+    # -- reads --
+
+    def pending_rows(self) -> List[Dict[str, Any]]:
+        """Mirrored rows with writes not yet replayed to Supabase."""
+        with self._lock:
+            rows = self._conn.execute(
+                "select * from call_logs where local_id in (select distinct local_id from ops where local_id is not null)"
+            ).fetchall()
+        return [self._row_out(r) for r in rows]
+
+    def merge_rows(self, remote_rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        pending = self.pending_rows()
+        if not pending:
+            return remote_rows
+        by_id = {row["id"]: row for row in pending}
+        # The mirror may lack columns the remote row has (defaults, joins); overlay, don't replace
+        merged = [{**row, **by_id.pop(row.get("id"), {})} for row in remote_rows]
+        merged.extend(by_id.values())
+        merged.sort(key=lambda r: r.get("created_at") or "", reverse=True)
+        return merged
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            row = self._conn.execute("select count(*) as n, min(created_at) as oldest, max(attempts) as attempts from ops").fetchone()
+            dead = self._conn.execute("select count(*) as n from dead_ops").fetchone()
+        return {
+            "pending_ops": row["n"],
+            "oldest_pending_age_seconds": round(self.clock() - row["oldest"], 3) if row["oldest"] is not None else None,
+            "max_attempts": row["attempts"] or 0,
+            "dead_ops": dead["n"],
+            "replayed_ops": self.replayed,
+            "last_error": self.last_error,
+        }
+
+    # -- replay (background worker) --
+
+    def _remote_id(self, local_id: str) -> Optional[int]:
+        row = self._conn.execute("select remote_id from call_logs where local_id = ?", (local_id,)).fetchone()
+        return row["remote_id"] if row is not None else None
+
+    def _apply(self, supabase: Any, batch: List[sqlite3.Row]) -> None:
+        kind = batch[0]["kind"]
+        if kind == "insert":
+            # Keyed by spool_id: a retry after a lost response (or a crash before remote_id was
+            # recorded) finds the row its first attempt created instead of inserting a duplicate
+            payloads = [{**loads(op["payload"]), "spool_id": op["local_id"]} for op in batch]
+            result = supabase.table("call_logs").upsert(payloads, on_conflict="spool_id").execute()
+            remote_ids = {row.get("spool_id"): row["id"] for row in result.data or []}
+            missing = [op["local_id"] for op in batch if op["local_id"] not in remote_ids]
+            if missing:
+                raise RuntimeError(f"Supabase returned no row for spooled inserts {missing}")
+            with self._lock:
+                for op in batch:
+                    self._conn.execute(
+                        "update call_logs set remote_id = ? where local_id = ?", (remote_ids[op["local_id"]], op["local_id"])
+                    )
+        elif kind == "update":
+            local_id = batch[0]["local_id"]
+            with self._lock:
+                remote_id = self._remote_id(local_id)
+            if remote_id is None:
+                raise RuntimeError(f"No Supabase id for spooled call log {local_id}")
+            update_data: Dict[str, Any] = {}
+            for op in batch:
+                update_data.update(loads(op["payload"]))
+            # Versioned write: the counters move from the summary Supabase holds now, whoever wrote it
+            analytics.update_call_log_summary(supabase, remote_id, update_data)
+        else:
+            logger.error("Dropping spooled op %s of unknown kind %r", batch[0]["seq"], kind)
+
+    def hold_replay_lease(self) -> bool:
+        """Take or renew the replay lease; False while another process holds a live one."""
+        now = self.clock()
+        with self._lock:
+            self._conn.execute("begin immediate")
+            try:
+                row = self._conn.execute("select holder, expires_at from replay_lease where name = 'replay'").fetchone()
+                held = row is None or row["holder"] == self.holder_id or row["expires_at"] < now
+                if held:
+                    self._conn.execute(
+                        "insert or replace into replay_lease (name, holder, expires_at) values ('replay', ?, ?)",
+                        (self.holder_id, now + self.lease_seconds),
+                    )
+                self._conn.execute("commit")
+            except BaseException:
+                self._conn.execute("rollback")
+                raise
+        return held
+
+    def _record_failure(self, batch: List[sqlite3.Row], exc: Exception) -> bool:
+        """Count a failed attempt; returns True when the batch was dead-lettered."""
+        error = str(exc)
+        with self._lock:
+            self._conn.executemany(
+                "update ops set attempts = attempts + 1, last_error = ? where seq = ?",
+                [(error, op["seq"]) for op in batch],
+            )
+        op = batch[0]
+        attempts = max(o["attempts"] for o in batch) + 1
+        # A batch of inserts is split up before any one of them is blamed
+        if (op["kind"] == "insert" and len(batch) > 1) or is_transient(exc) or attempts < self.max_attempts:
+            return False
+        self._dead_letter(batch)
+        logger.error(
+            "Spool ops %s (%s of %s) dead-lettered after %d attempts: %s",
+            [o["seq"] for o in batch], op["kind"], op["local_id"], attempts, error,
+        )
+        return True
+
+    def _move_to_dead(self, where: str, args: tuple, error: Optional[str] = None) -> None:
+        # Caller holds the lock and an open transaction
+        self._conn.execute(
+            "insert or replace into dead_ops (seq, kind, local_id, payload, created_at, attempts, last_error, dead_at) "
+            f"select seq, kind, local_id, payload, created_at, attempts, coalesce(?, last_error), ? from ops where {where}",
+            (error, self.clock(), *args),
+        )
+        self._conn.execute(f"delete from ops where {where}", args)
+
+    def _dead_letter(self, batch: List[sqlite3.Row]) -> None:
+        op = batch[0]
+        with self._lock:
+            self._conn.execute("begin immediate")
+            try:
+                if op["kind"] == "insert":
+                    # Updates of a call log whose insert is dead can never apply; they go with it,
+                    # and the tombstoned mirror row sends any later ones straight after them
+                    self._move_to_dead("local_id = ?", (op["local_id"],))
+                    self._conn.execute(
+                        "update call_logs set dead_at = ? where local_id = ?", (self.clock(), op["local_id"])
+                    )
+                else:
+                    seqs = tuple(o["seq"] for o in batch)
+                    self._move_to_dead(f"seq in ({', '.join('?' * len(seqs))})", seqs)
+                self._conn.execute("commit")
+            except BaseException:
+                self._conn.execute("rollback")
+                raise
+
+    def replay(self, supabase: Any, batch_size: int = 100) -> int:
+        """Drain spooled ops to Supabase in order; stops at the first failure to retry. Returns ops replayed.
+
+        Returns 0 at once while another process holds the replay lease.
+        """
+        if not self.hold_replay_lease():
+            return 0
+        with self._lock:
+            ops = self._conn.execute("select * from ops order by seq limit ?", (batch_size,)).fetchall()
+        done = 0
+        stalled = False
+        dead_locals = set()
+        # Updates already written as part of an earlier call log's coalesced write
+        consumed = set()
+        # Inserts up to this seq go one at a time, to isolate a row that fails its whole batch
+        single_until = 0
+        i = 0
+        while i < len(ops):
+            op = ops[i]
+            if op["seq"] in consumed or op["local_id"] in dead_locals:
+                i += 1
+                continue
+            if i and not self.hold_replay_lease():
+                break
+            kind = op["kind"]
+            j = i + 1
+            if kind == "insert":
+                # Consecutive inserts go up in one round trip
+                batch = [op]
+                if op["seq"] > single_until:
+                    while j < len(ops) and (ops[j]["seq"] in consumed or ops[j]["kind"] == "insert"):
+                        if ops[j]["seq"] not in consumed:
+                            batch.append(ops[j])
+                        j += 1
+            else:
+                # All pending updates of one call log make one write. Each carries the whole
+                # transcript and summary, so applied in order they amount to the last one
+                batch = [
+                    o
+                    for o in ops[i:]
+                    if o["kind"] == kind and o["local_id"] == op["local_id"] and o["seq"] not in consumed
+                ]
+            seqs = [o["seq"] for o in batch]
+            try:
+                self._apply(supabase, batch)
+            except Exception as exc:
+                self.last_error = str(exc)
+                if kind == "insert" and len(batch) > 1 and not is_transient(exc):
+                    single_until = seqs[-1]
+                    continue
+                if self._record_failure(batch, exc):
+                    if kind == "insert":
+                        dead_locals.add(op["local_id"])
+                    consumed.update(seqs)
+                    i = j
+                    continue
+                logger.warning("Spool replay stalled at op %s: %s", seqs[0], exc)
+                stalled = True
+                break
+            with self._lock:
+                self._conn.executemany("delete from ops where seq = ?", [(seq,) for seq in seqs])
+            consumed.update(seqs)
+            done += len(batch)
+            i = j
+        self.replayed += done
+        if not stalled:
+            self.last_error = None
+        return done
+
+    def prune(self, retention_seconds: float) -> int:
+        """Drop mirrored rows that are fully replayed (or dead) and idle for longer than the retention window."""
+        with self._lock:
+            cur = self._conn.execute(
+                "delete from call_logs where updated_at < ? and (remote_id is not null or dead_at is not null) "
+                "and local_id not in (select distinct local_id from ops where local_id is not null)",
+                (self.clock() - retention_seconds,),
+            )
+        return cur.rowcount
+
+
+_spool: Optional[CallLogSpool] = None
+
+
+def get_call_log_spool(settings: Settings) -> Optional[CallLogSpool]:
+    global _spool
+    if not settings.spool_enabled:
+        return None
+    if _spool is None:
+        _spool = CallLogSpool(
+            settings.spool_path,
+            max_attempts=settings.spool_max_attempts,
+            lease_seconds=settings.spool_replay_lease_seconds,
+        )
+    return _spool
+
+
+__all__ = ["CallLogSpool", "get_call_log_spool", "is_transient"]
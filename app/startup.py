@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional
+
+from . import PROCESS_STARTED
+from .db import get_supabase
+from .http_pool import get_http_client
+from .settings import Settings, get_settings
+from .spool import get_call_log_spool
+
+
+@dataclass
+class StartupState:
+    ready: bool = False
+    # component name -> "ok" | "skipped" | "error: ..."
+    components: Dict[str, str] = field(default_factory=dict)
+    import_seconds: Optional[float] = None
+    warmup_seconds: Optional[float] = None
+    first_turn_seconds: Optional[float] = None
+
+    def mark_imported(self) -> None:
+        if self.import_seconds is None:
+            self.import_seconds = time.perf_counter() - PROCESS_STARTED
+
+    def mark_first_turn(self) -> None:
+        if self.first_turn_seconds is None:
+            self.first_turn_seconds = time.perf_counter() - PROCESS_STARTED
+
+    def snapshot(self) -> Dict[str, Any]:
+        def ms(value: Optional[float]) -> Optional[float]:
+            return round(value * 1000, 2) if value is not None else None
+
+        return {
+            "ready": self.ready,
+            "components": dict(self.components),
+            "import_ms": ms(self.import_seconds),
+            "warmup_ms": ms(self.warmup_seconds),
+            "first_turn_ms": ms(self.first_turn_seconds),
+        }
+
+
+startup_state = StartupState()
+
+
+async def warm_up(settings: Settings) -> StartupState:
+    """Build the config cache, Supabase client and HTTP pool in parallel, then mark readiness."""
+    started = time.perf_counter()
+    tasks: Dict[str, Callable[[], Any]] = {
+        "settings": get_settings,
+        "http_pool": get_http_client,
+    }
+    if settings.supabase_url and settings.supabase_key:
+        tasks["supabase"] = lambda: get_supabase(settings)
+    else:
+        startup_state.components["supabase"] = "skipped"
+    if settings.spool_enabled:
+        tasks["spool"] = lambda: get_call_log_spool(settings)
+
+    results = await asyncio.gather(
+        *(asyncio.to_thread(fn) for fn in tasks.values()),
+        return_exceptions=True,
+    )
+    for name, result in zip(tasks, results):
+        startup_state.components[name] = f"error: {result}" if isinstance(result, BaseException) else "ok"
+
+    startup_state.warmup_seconds = time.perf_counter() - started
+    startup_state.ready = not any(v.startswith("error") for v in startup_state.components.values())
+    return startup_state
+
+
+__all__ = ["StartupState", "startup_state", "warm_up"]
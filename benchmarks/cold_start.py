@@ -0,0 +1,153 @@
+"""Cold-start benchmark: import cost of app.main and time to the first served /webhook turn.
+
+Every sample runs in a fresh interpreter. Supabase, the LLM and Retell are
+replaced by in-process stubs (tests/fakes.py), so the numbers cover this app's
+own startup path and none of the network.
+
+    python benchmarks/cold_start.py --runs 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_time_ms() -> float:
+    """Cumulative import time of app.main as reported by ``python -X importtime``."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    for line in proc.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].strip() == "app.main":
+            return int(parts[1]) / 1000
+    raise RuntimeError("app.main missing from -X importtime output")
+
+
+def first_turn_ms() -> Dict[str, float]:
+    """Start a cold process that serves one conversation turn; returns its timings."""
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {
+            **os.environ,
+            "SUPABASE_URL": "http://supabase.invalid",
+            "SUPABASE_KEY": "stub",
+            "SCHEDULER_ENABLED": "false",
+            "SPOOL_PATH": os.path.join(tmp, "call_logs.sqlite3"),
+        }
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child"],
+            cwd=ROOT,
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def _child() -> None:
+    sys.path.insert(0, ROOT)
+    # Imported first so PROCESS_STARTED is stamped before anything else loads
+    from app import PROCESS_STARTED
+
+    import app.main as main
+    from app import dedup, startup
+    from app.llm_client import LLMClient
+    from fastapi.testclient import TestClient
+    from tests.fakes import FakeSupabase
+
+    fake = FakeSupabase()
+    fake.tables["agent_config"] = [{"id": 1, "name": "bench", "prompt": "You are Dispatch.", "settings": {}}]
+    fake.tables["call_logs"] = [
+        {
+            "id": 1,
+            "driver_name": "Mike",
+            "phone_number": "+15550100",
+            "load_number": "7891-B",
+            "external_call_id": "bench-call",
+            "config_id": 1,
+            "created_at": "2026-01-01T00:00:00+00:00",
+            "transcript": None,
+            "structured_summary": None,
+            "summary_version": 0,
+        }
+    ]
+
+    class StubLLM(LLMClient):
+        def generate(self, messages: List[Dict[str, str]]) -> str:
+            return "Thanks Mike, noted. Drive safe."
+
+    main.get_supabase = startup.get_supabase = dedup.get_supabase = lambda settings: fake
+    main._build_llm = lambda settings: StubLLM()
+    main._post_reply = lambda settings, call_id, text: None
+
+    with TestClient(main.app) as client:
+        while client.get("/ready").status_code != 200:
+            time.sleep(0.001)
+        ready = time.perf_counter()
+        response = client.post(
+            "/webhook",
+            json={
+                "event": "transcript.final",
+                "call_id": "bench-call",
+                "transcript": "I'm driving on I-10 near Indio, CA. I should arrive tomorrow at 8:00 AM.",
+                "metadata": {"driver": "Mike", "load_number": "7891-B"},
+            },
+        )
+        response.raise_for_status()
+        served = time.perf_counter()
+        state = client.get("/ready").json()
+
+    print(
+        json.dumps(
+            {
+                "import_ms": state["import_ms"],
+                "warmup_ms": state["warmup_ms"],
+                "ready_ms": (ready - PROCESS_STARTED) * 1000,
+                "first_turn_served_ms": (served - PROCESS_STARTED) * 1000,
+            }
+        )
+    )
+
+
+def _summary(name: str, values: List[float]) -> str:
+    return (
+        f"{name:<24} median {statistics.median(values):9.2f} ms"
+        f"   min {min(values):9.2f} ms   max {max(values):9.2f} ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        _child()
+        return
+
+    imports = [import_time_ms() for _ in range(args.runs)]
+    turns = [first_turn_ms() for _ in range(args.runs)]
+    print(f"{args.runs} cold runs, Python {sys.version.split()[0]}")
+    print(_summary("import app.main", imports))
+    for key in ("warmup_ms", "ready_ms", "first_turn_served_ms"):
+        print(_summary(key[: -len("_ms")], [t[key] for t in turns]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""Microbenchmark: webhook parse and response serialize, old path vs current.
+
+Old parse:  json.loads(body) (what ``await req.json()`` does), then the
+            strict WebhookPayload, built a second time from picked fields
+            when the first construction fails.
+New parse:  WebhookPayload.model_validate_json(body), once.
+Old encode: jsonable_encoder + stdlib JSONResponse (FastAPI's default for a
+            returned dict).
+New encode: FastJSONResponse (orjson, no jsonable_encoder).
+
+    python benchmarks/webhook_json.py --number 20000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from pydantic import BaseModel, Field  # noqa: E402
+
+from app.fastjson import FastJSONResponse, orjson  # noqa: E402
+from app.schemas import WebhookPayload  # noqa: E402
+
+
+class LegacyWebhookPayload(BaseModel):
+    # The model /webhook used before the single lenient WebhookPayload
+    call_id: Optional[str | int] = None
+    transcript: str
+    metadata: Dict[str, Any] = Field(default_factory=dict)
+
+
+def legacy_parse(body: bytes) -> LegacyWebhookPayload:
+    payload_json = json.loads(body)
+    try:
+        return LegacyWebhookPayload(**payload_json)
+    except Exception:
+        return LegacyWebhookPayload(
+            call_id=payload_json.get("call_id"),
+            transcript=payload_json.get("transcript", ""),
+            metadata=payload_json.get("metadata", {}),
+        )
+
+
+def current_parse(body: bytes) -> WebhookPayload:
+    return WebhookPayload.model_validate_json(body)
+
+
+def legacy_encode(content: Any) -> bytes:
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def current_encode(content: Any) -> bytes:
+    return FastJSONResponse(content).body
+
+
+TRANSCRIPT = (
+    "Hi Sarah, this is Dispatch with a check call on load 7892-C. Can you give me an update on your status? "
+    "I'm currently driving on I-10 near Indio, CA. I should arrive tomorrow at 8:00 AM. Everything is going well. "
+) * 8
+
+BODIES = {
+    "transcript.partial": {
+        "event": "transcript.partial",
+        "call_id": "rt-67890",
+        "transcript": "I'm currently driving on I-10",
+        "metadata": {"driver_name": "Sarah", "load_number": "7892-C", "config_id": 3},
+    },
+    "transcript.final": {
+        "event": "transcript.final",
+        "call_id": "rt-67890",
+        "sequence": 42,
+        "transcript": TRANSCRIPT,
+        "metadata": {"driver_name": "Sarah", "load_number": "7892-C", "config_id": 3},
+    },
+    # No top-level transcript: the old path fails the first construction and builds the model twice
+    "call_ended": {
+        "event": "call_ended",
+        "call": {
+            "call_id": "rt-67890",
+            "disconnection_reason": "user_hangup",
+            "transcript": TRANSCRIPT,
+            "metadata": {"driver_name": "Sarah", "load_number": "7892-C", "config_id": 3},
+            "start_timestamp": 1760000000000,
+            "end_timestamp": 1760000123456,
+        },
+    },
+}
+
+CALL_LOG_ROWS = [
+    {
+        "id": i,
+        "driver_name": "Sarah",
+        "phone_number": "+15550100",
+        "load_number": "7892-C",
+        "transcript": TRANSCRIPT,
+        "structured_summary": {
+            "call_outcome": "In-Transit Update",
+            "driver_status": "Driving",
+            "current_location": "I-10 near Indio, CA",
+            "eta": "Tomorrow, 8:00 AM",
+            "emergency": False,
+        },
+        "external_call_id": f"rt-{i}",
+        "config_id": 3,
+        "created_at": "2026-10-19T10:15:00+00:00",
+    }
+    for i in range(100)
+]
+
+
+def cpu_us(fn: Callable[[Any], Any], arg: Any, number: int) -> float:
+    fn(arg)  # warm caches
+    started = time.process_time()
+    for _ in range(number):
+        fn(arg)
+    return (time.process_time() - started) / number * 1e6
+
+
+def report(
+    title: str, cases: Dict[str, Tuple[Any, int]], old: Callable[[Any], Any], new: Callable[[Any], Any]
+) -> None:
+    print(f"\n{title}")
+    print(f"  {'case':<24}{'old us':>10}{'new us':>10}{'speedup':>10}")
+    for name, (arg, number) in cases.items():
+        before, after = cpu_us(old, arg, number), cpu_us(new, arg, number)
+        print(f"  {name:<24}{before:>10.2f}{after:>10.2f}{before / after:>9.1f}x")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=20000, help="iterations per case (/call-logs runs 1/100 as many)")
+    args = parser.parse_args()
+    n = args.number
+
+    print(f"Python {sys.version.split()[0]}, encoder: {'orjson' if orjson is not None else 'json (orjson missing)'}")
+    bodies = {name: (json.dumps(body).encode(), n) for name, body in BODIES.items()}
+    report("parse (CPU per event)", bodies, legacy_parse, current_parse)
+    responses = {
+        "webhook ack": ({"ok": True, "call_log_id": 1234}, n),
+        "/call-logs (100 rows)": ({"messages": CALL_LOG_ROWS}, max(n // 100, 10)),
+    }
+    report("serialize (CPU per response)", responses, legacy_encode, current_encode)
+
+
+if __name__ == "__main__":
+    main()
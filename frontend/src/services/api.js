@@ -45,6 +45,15 @@ export const callAPI = {
   },
 }
 
+// Analytics API
+export const analyticsAPI = {
+  // Pre-aggregated call counters; params: { granularity, since, until, config_id }
+  get: async (params = {}) => {
+    const response = await api.get('/analytics', { params })
+    return response.data
+  },
+}
+
 // Health check
 export const healthAPI = {
   check: async () => {
@@ -0,0 +1,77 @@
+from typing import Any, Dict, List
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import admission, dedup, main, scheduler, spool, startup
+from app.llm_client import LLMClient
+from app.settings import get_settings
+from tests.fakes import FakeSupabase
+
+
+class StubLLM(LLMClient):
+    def __init__(self) -> None:
+        self.calls: List[List[Dict[str, str]]] = []
+
+    def generate(self, messages: List[Dict[str, str]]) -> str:
+        self.calls.append(messages)
+        return "Thanks, noted."
+
+
+@pytest.fixture
+def supabase() -> FakeSupabase:
+    fake = FakeSupabase()
+    fake.tables["agent_config"] = [{"id": 1, "name": "Dispatch", "prompt": "You are Dispatch.", "settings": {}}]
+    fake.tables["call_logs"] = [
+        {
+            "id": 1,
+            "driver_name": "Mike",
+            "phone_number": "+15550100",
+            "load_number": "7891-B",
+            "external_call_id": "rt-1",
+            "config_id": 1,
+            "created_at": "2026-01-01T10:15:00+00:00",
+            "transcript": None,
+            "structured_summary": None,
+            "summary_version": 0,
+        }
+    ]
+    return fake
+
+
+@pytest.fixture
+def llm() -> StubLLM:
+    return StubLLM()
+
+
+@pytest.fixture
+def env(monkeypatch: pytest.MonkeyPatch, tmp_path: Any) -> pytest.MonkeyPatch:
+    """Settings for an app wired to stubs; tests may setenv more before using ``client``."""
+    monkeypatch.setenv("SUPABASE_URL", "http://supabase.invalid")
+    monkeypatch.setenv("SUPABASE_KEY", "stub")
+    monkeypatch.setenv("SCHEDULER_ENABLED", "false")
+    monkeypatch.setenv("SPOOL_ENABLED", "false")
+    monkeypatch.setenv("SPOOL_PATH", str(tmp_path / "call_logs.sqlite3"))
+    return monkeypatch
+
+
+@pytest.fixture
+def client(env: pytest.MonkeyPatch, supabase: FakeSupabase, llm: StubLLM) -> Any:
+    get_settings.cache_clear()
+    # Fresh per-process singletons for every test
+    env.setattr(admission, "_controller", None)
+    env.setattr(dedup, "_deduplicator", None)
+    env.setattr(spool, "_spool", None)
+    env.setattr(scheduler, "_scheduler", None)
+    state = startup.StartupState()
+    env.setattr(startup, "startup_state", state)
+    env.setattr(main, "startup_state", state)
+
+    env.setattr(main, "get_supabase", lambda settings: supabase)
+    env.setattr(startup, "get_supabase", lambda settings: supabase)
+    env.setattr(dedup, "get_supabase", lambda settings: supabase)
+    env.setattr(main, "_build_llm", lambda settings: llm)
+    env.setattr(main, "_post_reply", lambda settings, call_id, text: None)
+    with TestClient(main.app) as test_client:
+        yield test_client
+    get_settings.cache_clear()
@@ -0,0 +1,229 @@
+"""In-memory stand-in for the parts of the Supabase client the app uses.
+
+Rows are copied in and out so callers never share state with the "database",
+and the SQL functions documented in the README are reimplemented as methods.
+"""
+
+from __future__ import annotations
+
+import copy
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+@dataclass
+class FakeResult:
+    data: Any
+
+
+class FakeQuery:
+    def __init__(self, db: "FakeSupabase", table: str) -> None:
+        self.db = db
+        self.table = table
+        self.op = "select"
+        self.columns = "*"
+        self.payload: Any = None
+        self.ignore_duplicates = False
+        self.on_conflict: Optional[Tuple[str, ...]] = None
+        self.filters: List[Callable[[Dict[str, Any]], bool]] = []
+        self.order_by: List[Tuple[str, bool]] = []
+        self.bounds: Optional[Tuple[int, int]] = None
+
+    # -- operations --
+
+    def select(self, columns: str = "*") -> "FakeQuery":
+        self.op, self.columns = "select", columns
+        return self
+
+    def insert(self, payload: Any) -> "FakeQuery":
+        self.op, self.payload = "insert", payload
+        return self
+
+    def upsert(self, payload: Any, ignore_duplicates: bool = False, on_conflict: str = "", **_: Any) -> "FakeQuery":
+        self.op, self.payload, self.ignore_duplicates = "upsert", payload, ignore_duplicates
+        if on_conflict:
+            self.on_conflict = tuple(c.strip() for c in on_conflict.split(","))
+        return self
+
+    def update(self, payload: Dict[str, Any]) -> "FakeQuery":
+        self.op, self.payload = "update", payload
+        return self
+
+    def delete(self) -> "FakeQuery":
+        self.op = "delete"
+        return self
+
+    # -- filters and modifiers --
+
+    def eq(self, column: str, value: Any) -> "FakeQuery":
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def lt(self, column: str, value: Any) -> "FakeQuery":
+        self.filters.append(lambda row: row.get(column) is not None and row[column] < value)
+        return self
+
+    def gte(self, column: str, value: Any) -> "FakeQuery":
+        self.filters.append(lambda row: row.get(column) is not None and row[column] >= value)
+        return self
+
+    def is_(self, column: str, value: str) -> "FakeQuery":
+        assert value == "null"
+        self.filters.append(lambda row: row.get(column) is None)
+        return self
+
+    def order(self, column: str, desc: bool = False) -> "FakeQuery":
+        self.order_by.append((column, desc))
+        return self
+
+    def limit(self, count: int) -> "FakeQuery":
+        return self.range(0, count - 1)
+
+    def range(self, start: int, end: int) -> "FakeQuery":
+        self.bounds = (start, end)
+        return self
+
+    def execute(self) -> FakeResult:
+        with self.db.lock:
+            self.db.requests.append((self.table, self.op))
+            return FakeResult(copy.deepcopy(getattr(self, f"_{self.op}")()))
+
+    # -- execution (db lock held) --
+
+    def _rows(self) -> List[Dict[str, Any]]:
+        return self.db.tables.setdefault(self.table, [])
+
+    def _matching(self) -> List[Dict[str, Any]]:
+        return [row for row in self._rows() if all(f(row) for f in self.filters)]
+
+    def _select(self) -> List[Dict[str, Any]]:
+        rows = self._matching()
+        for column, desc in reversed(self.order_by):
+            rows.sort(key=lambda r: (r.get(column) is None, r.get(column)), reverse=desc)
+        # PostgREST caps every response at max_rows, whatever range was asked for
+        start, end = self.bounds or (0, len(rows))
+        rows = rows[start : min(end + 1, start + self.db.max_rows)]
+        if self.columns != "*":
+            wanted = [c.strip() for c in self.columns.split(",")]
+            rows = [{c: row.get(c) for c in wanted} for row in rows]
+        return rows
+
+    def _insert(self) -> List[Dict[str, Any]]:
+        payloads = self.payload if isinstance(self.payload, list) else [self.payload]
+        inserted = []
+        for payload in payloads:
+            row = copy.deepcopy(payload)
+            if self.table in self.db.identity_tables and row.get("id") is None:
+                row["id"] = max((r["id"] for r in self._rows()), default=0) + 1
+            if self._find(row) is not None:
+                raise RuntimeError(f"duplicate key value violates unique constraint on {self.table}")
+            self._rows().append(row)
+            inserted.append(row)
+        return inserted
+
+    def _upsert(self) -> List[Dict[str, Any]]:
+        payloads = self.payload if isinstance(self.payload, list) else [self.payload]
+        written = []
+        for payload in payloads:
+            existing = self._find(payload, self.on_conflict)
+            if existing is None:
+                row = copy.deepcopy(payload)
+                if self.table in self.db.identity_tables and row.get("id") is None:
+                    row["id"] = max((r["id"] for r in self._rows()), default=0) + 1
+                self._rows().append(row)
+                written.append(row)
+            elif not self.ignore_duplicates:
+                existing.update(copy.deepcopy(payload))
+                written.append(existing)
+        return written
+
+    def _update(self) -> List[Dict[str, Any]]:
+        rows = self._matching()
+        for row in rows:
+            row.update(copy.deepcopy(self.payload))
+        return rows
+
+    def _delete(self) -> List[Dict[str, Any]]:
+        rows = self._matching()
+        self.db.tables[self.table] = [row for row in self._rows() if row not in rows]
+        return rows
+
+    def _find(self, row: Dict[str, Any], key: Optional[Tuple[str, ...]] = None) -> Optional[Dict[str, Any]]:
+        key = key or self.db.primary_keys.get(self.table, ("id",))
+        for existing in self._rows():
+            if all(existing.get(c) == row.get(c) for c in key):
+                return existing
+        return None
+
+
+class FakeRpc:
+    def __init__(self, db: "FakeSupabase", name: str, params: Dict[str, Any]) -> None:
+        self.db, self.name, self.params = db, name, params
+
+    def execute(self) -> FakeResult:
+        with self.db.lock:
+            self.db.rpcs.append((self.name, copy.deepcopy(self.params)))
+            return FakeResult(copy.deepcopy(getattr(self.db, f"_fn_{self.name}")(**self.params)))
+
+
+class FakeSupabase:
+    identity_tables = {"agent_config", "call_logs"}
+    primary_keys = {
+        "call_analytics": ("bucket_start", "config_id", "dimension", "value"),
+        "scheduler_in_flight": ("external_call_id",),
+        "webhook_deliveries": ("call_id", "event_key"),
+    }
+
+    def __init__(self, max_rows: int = 1000) -> None:
+        self.tables: Dict[str, List[Dict[str, Any]]] = {}
+        self.requests: List[Tuple[str, str]] = []
+        self.rpcs: List[Tuple[str, Dict[str, Any]]] = []
+        self.max_rows = max_rows
+        self.lock = threading.RLock()
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
+
+    def rpc(self, name: str, params: Dict[str, Any]) -> FakeRpc:
+        return FakeRpc(self, name, params)
+
+    def rows(self, table: str) -> List[Dict[str, Any]]:
+        return copy.deepcopy(self.tables.get(table, []))
+
+    # -- SQL functions from the README --
+
+    def _fn_increment_call_analytics(self, deltas: List[Dict[str, Any]]) -> None:
+        counters = self.tables.setdefault("call_analytics", [])
+        for delta in deltas:
+            key = (delta["bucket_start"], delta["config_id"], delta["dimension"], delta["value"])
+            row = next((r for r in counters if (r["bucket_start"], r["config_id"], r["dimension"], r["value"]) == key), None)
+            if row is None:
+                counters.append({**{k: delta[k] for k in ("bucket_start", "config_id", "dimension", "value")}, "count": 0})
+                row = counters[-1]
+            row["count"] += delta["count"]
+
+    def _fn_update_call_log_summary(
+        self, p_id: int, p_version: int, p_update: Dict[str, Any], p_deltas: List[Dict[str, Any]]
+    ) -> bool:
+        row = next((r for r in self.tables.get("call_logs", []) if r["id"] == p_id), None)
+        if row is None or row.get("summary_version", 0) != p_version:
+            return False
+        row.update(
+            transcript=p_update.get("transcript"),
+            structured_summary=copy.deepcopy(p_update.get("structured_summary")),
+            summary_version=p_version + 1,
+        )
+        self._fn_increment_call_analytics(p_deltas)
+        return True
+
+    def _fn_rebuild_call_analytics(self, bucket_seconds: int) -> int:
+        from app.analytics import summary_deltas
+
+        calls = self.tables.get("call_logs", [])
+        self.tables["call_analytics"] = []
+        for row in calls:
+            self._fn_increment_call_analytics(
+                summary_deltas(None, row.get("structured_summary"), row.get("created_at"), row.get("config_id"))
+            )
+        return len(calls)
@@ -0,0 +1,99 @@
+import threading
+import time
+
+from app import analytics, main
+from app.spool import CallLogSpool
+from app.summary import build_structured_summary
+from tests.fakes import FakeSupabase
+
+EMERGENCY = "Emergency! I just had a blowout on I-15 North at mile marker 123."
+DRIVING = EMERGENCY + " Okay, help is here now and I'm driving again on I-15."
+
+
+def _counters(supabase: FakeSupabase) -> dict:
+    return {(r["dimension"], r["value"]): r["count"] for r in supabase.rows("call_analytics") if r["count"]}
+
+
+def _expected(transcript: str) -> dict:
+    summary = build_structured_summary(transcript)
+    return {(d["dimension"], d["value"]): d["count"] for d in analytics.summary_deltas(None, summary, None, 1)}
+
+
+def test_overlapping_events_for_one_call_count_it_once(client, supabase, monkeypatch):
+    # Both deliveries look the call log up, then wait in the conversation turn before writing
+    started = threading.Barrier(2)
+    original_turn = main._run_conversation_turn
+
+    def slow_turn(settings, payload):
+        started.wait(timeout=5)
+        if payload.transcript == EMERGENCY:
+            time.sleep(0.1)  # the older event finishes last
+        original_turn(settings, payload)
+
+    monkeypatch.setattr(main, "_run_conversation_turn", slow_turn)
+    responses = []
+
+    def post(transcript):
+        responses.append(client.post("/webhook", json={"event": "transcript.final", "call_id": "rt-1", "transcript": transcript}))
+
+    threads = [threading.Thread(target=post, args=(t,)) for t in (EMERGENCY, DRIVING)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [r.status_code for r in responses] == [200, 200]
+    (row,) = supabase.rows("call_logs")
+    assert row["summary_version"] == 2
+    assert _counters(supabase)[("calls", "total")] == 1
+    assert _counters(supabase) == _expected(row["transcript"])
+
+
+def test_stale_read_is_retried_against_the_current_summary(supabase):
+    (stale,) = supabase.rows("call_logs")
+    for transcript in (EMERGENCY, DRIVING):
+        update = {"transcript": transcript, "structured_summary": build_structured_summary(transcript)}
+        analytics.update_call_log_summary(supabase, 1, update, current=stale)
+
+    assert _counters(supabase) == _expected(DRIVING)
+
+
+def test_spooled_updates_move_counters_against_the_remote_row(supabase):
+    spool = CallLogSpool(":memory:")
+    mirrored = spool.remember_call_log(supabase.rows("call_logs")[0])
+    for transcript in (EMERGENCY, DRIVING):
+        spool.update_call_log(
+            mirrored["local_id"], {"transcript": transcript, "structured_summary": build_structured_summary(transcript)}
+        )
+
+    assert spool.replay(supabase) == 2
+    assert _counters(supabase) == _expected(DRIVING)
+
+
+def test_query_pages_past_the_row_cap():
+    supabase = FakeSupabase(max_rows=10)
+    supabase.tables["call_analytics"] = [
+        {"bucket_start": f"2026-01-01T{h:02d}:00:00+00:00", "config_id": 1, "dimension": "calls", "value": "total", "count": 1}
+        for h in range(24)
+    ]
+
+    view = analytics.query(supabase, granularity="day", page_size=10)
+
+    assert view["totals"]["calls"] == 24
+
+
+def test_bad_range_is_a_client_error(client):
+    response = client.get("/analytics", params={"since": "yesterday"})
+    assert response.status_code == 400
+
+
+def test_rebuild_recomputes_counters(client, supabase):
+    supabase.tables["call_analytics"] = [
+        {"bucket_start": "2020-01-01T00:00:00+00:00", "config_id": 0, "dimension": "calls", "value": "total", "count": 7}
+    ]
+    supabase.tables["call_logs"][0]["structured_summary"] = build_structured_summary(DRIVING)
+
+    response = client.post("/analytics/rebuild")
+
+    assert response.json() == {"ok": True, "calls": 1}
+    assert _counters(supabase) == _expected(DRIVING)
@@ -0,0 +1,160 @@
+import asyncio
+import threading
+import time
+
+from app import dedup
+from app.dedup import IN_PROGRESS, EventDeduplicator, SharedDeliveryIndex
+from app.schemas import WebhookPayload
+from tests.fakes import FakeSupabase
+
+PAYLOAD = WebhookPayload(event="transcript.final", call_id="rt-1", event_id="evt-1", transcript="On I-10 near Indio.")
+
+
+class Clock:
+    def __init__(self, now: float = 1_800_000_000.0) -> None:
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _workers(supabase, clock=None, count=2):
+    """Deduplicators of separate worker processes sharing one Supabase."""
+    return [
+        EventDeduplicator(shared=SharedDeliveryIndex(lambda: supabase, claim_timeout_seconds=60, clock=clock or Clock()))
+        for _ in range(count)
+    ]
+
+
+def test_retry_on_another_worker_gets_the_first_response():
+    supabase = FakeSupabase()
+    first, second = _workers(supabase)
+
+    async def scenario():
+        assert await first.begin(PAYLOAD) is None
+        in_progress = await second.begin(PAYLOAD)
+        await first.complete(PAYLOAD, {"ok": True, "call_log_id": 1})
+        return in_progress, await second.begin(PAYLOAD)
+
+    in_progress, repeated = asyncio.run(scenario())
+    assert in_progress == IN_PROGRESS
+    assert repeated == {"ok": True, "call_log_id": 1}
+    assert second.stats.duplicates_shared == 2
+    assert supabase.rows("webhook_deliveries")[0]["response"] == {"ok": True, "call_log_id": 1}
+
+
+def test_failed_delivery_releases_its_claim():
+    supabase = FakeSupabase()
+    first, second = _workers(supabase)
+
+    async def scenario():
+        assert await first.begin(PAYLOAD) is None
+        first.abort(PAYLOAD, RuntimeError("llm down"))
+        await asyncio.sleep(0.05)  # release runs in the executor
+        return await second.begin(PAYLOAD)
+
+    assert asyncio.run(scenario()) is None
+    assert supabase.rows("webhook_deliveries")[0].get("response") is None
+
+
+def test_claim_of_a_dead_worker_expires():
+    supabase = FakeSupabase()
+    clock = Clock()
+    first, second = _workers(supabase, clock)
+
+    async def scenario():
+        assert await first.begin(PAYLOAD) is None
+        assert await second.begin(PAYLOAD) == IN_PROGRESS
+        clock.now += 61
+        return await second.begin(PAYLOAD)
+
+    assert asyncio.run(scenario()) is None
+
+
+def test_shared_index_failure_falls_back_to_local_dedup():
+    class Down:
+        def table(self, name):
+            raise ConnectionError("supabase unreachable")
+
+    worker = EventDeduplicator(shared=SharedDeliveryIndex(lambda: Down()))
+
+    async def scenario():
+        assert await worker.begin(PAYLOAD) is None
+        await worker.complete(PAYLOAD, {"ok": True})
+        return await worker.begin(PAYLOAD)
+
+    assert asyncio.run(scenario()) == {"ok": True}
+    assert worker.stats.shared_errors == 2
+
+
+def test_webhook_retry_reaching_a_fresh_worker_is_not_reprocessed(client, llm, monkeypatch):
+    body = {"event": "transcript.final", "call_id": "rt-1", "event_id": "evt-9", "transcript": "Driving on I-10."}
+    first = client.post("/webhook", json=body).json()
+    # A different worker process: empty local index, same Supabase
+    monkeypatch.setattr(dedup, "_deduplicator", None)
+    assert client.post("/webhook", json=body).json() == first
+    assert len(llm.calls) == 1
+
+
+def test_retry_while_another_worker_is_processing_is_told_to_retry(client, supabase):
+    # Another worker claimed this delivery and has not finished it
+    supabase.tables["webhook_deliveries"] = [
+        {"call_id": "rt-1", "event_key": "id:evt-7", "response": None, "claimed_at": "2999-01-01T00:00:00+00:00"}
+    ]
+    body = {"event": "transcript.final", "call_id": "rt-1", "event_id": "evt-7", "transcript": "Driving on I-10."}
+
+    response = client.post("/webhook", json=body)
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "5"
+
+
+class SlowIndex(SharedDeliveryIndex):
+    """A Supabase that answers, but only once ``answer`` is set."""
+
+    def __init__(self) -> None:
+        super().__init__(lambda: FakeSupabase())
+        self.answer = threading.Event()
+        self.calls = 0
+
+    def claim(self, key, *args):
+        self.calls += 1
+        self.answer.wait()
+        return None
+
+    store = release = claim
+
+
+def test_slow_shared_index_does_not_delay_the_webhook():
+    shared = SlowIndex()
+    clock = Clock()
+    worker = EventDeduplicator(
+        clock=clock, shared=shared, shared_timeout_seconds=0.05, breaker_failures=2, breaker_cooldown_seconds=30
+    )
+
+    async def deliver(event_id):
+        payload = PAYLOAD.model_copy(update={"event_id": event_id})
+        started = time.perf_counter()
+        assert await worker.begin(payload) is None
+        await worker.complete(payload, {"ok": True})
+        return time.perf_counter() - started
+
+    async def scenario():
+        try:
+            # Claim and store each wait out the deadline, then the breaker skips the shared index
+            first = await deliver("evt-1")
+            second = await deliver("evt-2")
+            return first, second, shared.calls
+        finally:
+            shared.answer.set()
+
+    first, second, calls = asyncio.run(scenario())
+    assert first < 0.5
+    assert second < 0.01
+    assert calls == 2
+    assert worker.stats.shared_skipped_windows == 1
+
+    # After the cooldown the shared index is tried again
+    clock.now += 31
+    assert asyncio.run(deliver("evt-3")) < 0.5
+    assert shared.calls == 4
@@ -0,0 +1,264 @@
+from typing import Any, Dict, List
+
+import pytest
+
+from app.calls import CallPlacementError
+from app.scheduler import CallScheduler, MemoryScheduleStore, PlannedCall, ScheduleStore, defer_for_quiet_hours
+
+
+HOUR = 3600
+
+
+class FakeClock:
+    def __init__(self, now: float = 0.0) -> None:
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class StubPlacer:
+    """Records placement times; raises the queued errors first, then succeeds."""
+
+    def __init__(self, clock: FakeClock) -> None:
+        self.clock = clock
+        self.placed: List[float] = []
+        self.errors: List[Exception] = []
+
+    def __call__(self, call: PlannedCall) -> Dict[str, Any]:
+        self.placed.append(self.clock())
+        if self.errors:
+            raise self.errors.pop(0)
+        return {"call_id": len(self.placed), "external_call_id": f"ext-{len(self.placed)}"}
+
+
+def _scheduler(clock: FakeClock, placer: StubPlacer, **kwargs: Any) -> CallScheduler:
+    options = dict(rate_per_minute=6000, burst=100, max_concurrent=100, retry_base_seconds=60)
+    options.update(kwargs)
+    return CallScheduler(place=placer, store=MemoryScheduleStore(), clock=clock, **options)
+
+
+def _call(due_at: float = 0.0, **kwargs: Any) -> PlannedCall:
+    return PlannedCall(
+        driver_name="Mike", phone_number="+1 555 0100", load_number="7891-B", config_id=1, due_at=due_at, **kwargs
+    )
+
+
+def _run_until(scheduler: CallScheduler, clock: FakeClock, until: float, step: float = 30) -> None:
+    while clock.now <= until:
+        scheduler.run_due()
+        clock.now += step
+
+
+def test_schedule_store_is_abstract():
+    with pytest.raises(TypeError):
+        ScheduleStore()
+
+
+def test_quiet_hours_defer_to_window_end():
+    # 22:00-06:00 local at UTC-5: 03:00 UTC is 22:00 local, deferred to 11:00 UTC
+    call = _call(quiet_hours_start=22, quiet_hours_end=6, utc_offset_minutes=-300)
+    assert defer_for_quiet_hours(call, 3 * HOUR) == 11 * HOUR
+    assert defer_for_quiet_hours(call, 12 * HOUR) == 12 * HOUR
+
+
+def test_scheduled_call_waits_for_quiet_hours_to_end():
+    clock = FakeClock()
+    placer = StubPlacer(clock)
+    scheduler = _scheduler(clock, placer)
+    scheduler.schedule(_call(quiet_hours_start=0, quiet_hours_end=2))
+
+    _run_until(scheduler, clock, 3 * HOUR, step=600)
+
+    assert placer.placed == [2 * HOUR]
+
+
+def test_failed_placements_back_off_exponentially_then_give_up():
+    clock = FakeClock()
+    placer = StubPlacer(clock)
+    placer.errors = [CallPlacementError(502, "Retell API error")] * 3
+    scheduler = _scheduler(clock, placer, max_attempts=3)
+    scheduler.schedule(_call())
+
+    _run_until(scheduler, clock, HOUR)
+
+    # attempt 1 at 0, retry after 60s, then after 120s; the third failure exhausts max_attempts
+    assert placer.placed == [0, 60, 180]
+    assert scheduler.pending() == []
+
+
+def test_client_errors_are_not_retried():
+    clock = FakeClock()
+    placer = StubPlacer(clock)
+    placer.errors = [CallPlacementError(400, "Invalid config_id")]
+    scheduler = _scheduler(clock, placer)
+    scheduler.schedule(_call())
+
+    _run_until(scheduler, clock, HOUR)
+
+    assert placer.placed == [0]
+    assert scheduler.pending() == []
+
+
+def test_recurring_call_keeps_its_slots():
+    clock = FakeClock()
+    placer = StubPlacer(clock)
+    scheduler = _scheduler(clock, placer)
+    scheduler.schedule(_call(interval_seconds=HOUR))
+
+    _run_until(scheduler, clock, 3 * HOUR)
+
+    assert placer.placed == [0, HOUR, 2 * HOUR, 3 * HOUR]
+
+
+def test_retry_of_recurring_call_does_not_skip_next_slot():
+    clock = FakeClock()
+    placer = StubPlacer(clock)
+    placer.errors = [CallPlacementError(502, "Retell API error")]
+    scheduler = _scheduler(clock, placer)
+    scheduler.schedule(_call(interval_seconds=HOUR))
+
+    _run_until(scheduler, clock, 2 * HOUR)
+
+    assert placer.placed == [0, 60, HOUR, 2 * HOUR]
+
+
+def test_no_answer_is_retried_and_one_entry_kept_per_driver():
+    clock = FakeClock()
+    placer = StubPlacer(clock)
+    scheduler = _scheduler(clock, placer)
+    scheduler.schedule(_call())
+    scheduler.schedule(_call(due_at=HOUR))
+    assert len(scheduler.pending()) == 1
+
+    scheduler.run_due()
+    assert scheduler.in_flight_count() == 1
+    clock.now = 90
+    assert scheduler.report_call_ended("ext-1", "dial_no_answer")
+    assert scheduler.in_flight_count() == 0
+
+    _run_until(scheduler, clock, HOUR)
+    # Retried 60s after the no-answer, not at the later merged request
+    assert placer.placed == [0, 150]
+
+
+def test_rate_limit_paces_placements():
+    clock = FakeClock()
+    placer = StubPlacer(clock)
+    scheduler = _scheduler(clock, placer, rate_per_minute=1, burst=1)
+    for i in range(3):
+        scheduler.schedule(PlannedCall("Driver", f"+1555010{i}", "L", 1, due_at=0))
+
+    _run_until(scheduler, clock, 150, step=15)
+
+    assert placer.placed == [0, 60, 120]
+
+
+def test_only_the_lease_holder_places_calls():
+    clock = FakeClock()
+    store = MemoryScheduleStore(clock)
+    placers = [StubPlacer(clock), StubPlacer(clock)]
+    workers = [
+        CallScheduler(place=placer, store=store, clock=clock, rate_per_minute=6000, burst=100, lease_seconds=120)
+        for placer in placers
+    ]
+    # Scheduled through the second worker, placed once by whichever holds the lease
+    workers[1].schedule(_call(interval_seconds=HOUR))
+    for worker in workers:
+        worker.run_due()
+
+    assert placers[0].placed == [0]
+    assert placers[1].placed == []
+    assert workers[1].in_flight_count() == 1
+
+    # A call_ended handled by the other worker frees the slot and queues the retry
+    clock.now = 30
+    assert workers[1].report_call_ended("ext-1", "dial_busy")
+    assert workers[0].in_flight_count() == 0
+    for now in (30, 90):
+        clock.now = now
+        for worker in workers:
+            worker.run_due()
+    assert placers[0].placed == [0, 90]
+    assert workers[1].in_flight_count() == 1
+
+    # Cancelling on any worker removes the entry everywhere
+    (planned,) = workers[1].pending()
+    assert workers[1].cancel(planned.id)
+    clock.now = HOUR
+    workers[0].run_due()
+    assert placers[0].placed == [0, 90]
+
+
+def test_lease_passes_to_another_worker_when_it_expires():
+    clock = FakeClock()
+    store = MemoryScheduleStore(clock)
+    first, second = StubPlacer(clock), StubPlacer(clock)
+    leader = CallScheduler(place=first, store=store, clock=clock, lease_seconds=60)
+    standby = CallScheduler(place=second, store=store, clock=clock, lease_seconds=60)
+    leader.run_due()
+    standby.schedule(_call(due_at=30))
+
+    clock.now = 30
+    standby.run_due()
+    assert second.placed == []
+
+    # The leader stopped renewing; after the lease lapses the standby takes over
+    clock.now = 61
+    standby.run_due()
+    assert second.placed == [61]
+    assert first.placed == []
+
+
+def test_late_recurring_call_is_not_placed_twice():
+    for limits in ({}, dict(rate_per_minute=10, burst=1, max_concurrent=10)):
+        clock = FakeClock()
+        placer = StubPlacer(clock)
+        scheduler = _scheduler(clock, placer, **limits)
+        scheduler.schedule(_call(interval_seconds=HOUR))
+
+        # Scheduler down for five hours: the missed slots collapse into one call
+        clock.now = 5 * HOUR
+        _run_until(scheduler, clock, 6 * HOUR - 1, step=10)
+
+        assert placer.placed == [5 * HOUR]
+        (planned,) = scheduler.pending()
+        assert planned.due_at == planned.slot_at == 6 * HOUR
+
+
+def test_recurring_call_deferred_by_quiet_hours_is_placed_once():
+    clock = FakeClock()
+    placer = StubPlacer(clock)
+    scheduler = _scheduler(clock, placer)
+    scheduler.schedule(_call(interval_seconds=HOUR, quiet_hours_start=0, quiet_hours_end=3))
+
+    _run_until(scheduler, clock, 5 * HOUR, step=10)
+
+    assert placer.placed == [3 * HOUR, 4 * HOUR, 5 * HOUR]
+
+
+def test_next_recurring_slot_skips_quiet_hours():
+    clock = FakeClock()
+    placer = StubPlacer(clock)
+    scheduler = _scheduler(clock, placer)
+    scheduler.schedule(_call(interval_seconds=2 * HOUR, quiet_hours_start=1, quiet_hours_end=3))
+
+    _run_until(scheduler, clock, 5 * HOUR, step=10)
+
+    # The 02:00 slot falls in quiet hours; it and the recurrence move to 03:00
+    assert placer.placed == [0, 3 * HOUR, 5 * HOUR]
+
+
+def test_standby_workers_do_not_index_scheduled_calls():
+    clock = FakeClock()
+    store = MemoryScheduleStore(clock)
+    leader = CallScheduler(place=StubPlacer(clock), store=store, clock=clock)
+    standby = CallScheduler(place=StubPlacer(clock), store=store, clock=clock)
+    leader.run_due()
+
+    planned = [standby.schedule(PlannedCall("Driver", f"+1555{i:04d}", "L", 1, due_at=HOUR)) for i in range(50)]
+    for call in planned[:10]:
+        assert standby.cancel(call.id)
+
+    assert (standby._heap, standby._pending, standby._by_driver) == ([], {}, {})
+    assert len(standby.pending()) == 40
@@ -0,0 +1,24 @@
+import fastapi.routing
+
+from app.schemas import WebhookPayload
+
+
+def test_config_is_validated_once(client, monkeypatch):
+    def no_revalidation(*args, **kwargs):
+        raise AssertionError("response_model re-validated the returned config")
+
+    monkeypatch.setattr(fastapi.routing, "serialize_response", no_revalidation)
+
+    response = client.get("/config/1")
+
+    assert response.status_code == 200
+    assert response.json() == {"id": 1, "name": "Dispatch", "prompt": "You are Dispatch.", "settings": {}, "created_at": None}
+
+
+def test_webhook_payload_coerces_wrong_types_instead_of_failing():
+    payload = WebhookPayload.model_validate_json(
+        b'{"event": 5, "call_id": true, "transcript": null, "metadata": [], "call": {"call_id": "rt-9", "disconnection_reason": "dial_busy"}}'
+    )
+
+    assert (payload.event_type, payload.call_id, payload.transcript, payload.metadata) == (None, None, "", {})
+    assert (payload.ended_call_id, payload.ended_reason) == ("rt-9", "dial_busy")
@@ -0,0 +1,169 @@
+import httpx
+from postgrest.exceptions import APIError
+
+from app.spool import CallLogSpool, is_transient
+from tests.fakes import FakeSupabase
+
+
+def test_merge_overlays_pending_writes_on_the_remote_row(tmp_path):
+    spool = CallLogSpool(str(tmp_path / "spool.sqlite3"))
+    remote = {
+        "id": 7,
+        "driver_name": "Mike",
+        "external_call_id": "rt-7",
+        "created_at": "2026-01-01T10:15:00+00:00",
+        "transcript": None,
+        "summary_version": 3,
+    }
+    local = spool.remember_call_log({k: v for k, v in remote.items() if k != "summary_version"})
+    spool.update_call_log(local["local_id"], {"transcript": "Arrived at the receiver."})
+
+    merged = spool.merge_rows([remote, {"id": 8, "created_at": "2026-01-01T09:00:00+00:00"}])
+    assert [row["id"] for row in merged] == [7, 8]
+    assert merged[0]["transcript"] == "Arrived at the receiver."
+    # Columns only Supabase has survive the overlay
+    assert merged[0]["summary_version"] == 3
+
+
+class Clock:
+    def __init__(self, now: float = 1_800_000_000.0) -> None:
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class RejectingSupabase(FakeSupabase):
+    """Rejects call_logs inserts carrying a bad driver name, like a check constraint would."""
+
+    def table(self, name):
+        query = super().table(name)
+        execute = query.execute
+
+        def checked():
+            payloads = query.payload if isinstance(query.payload, list) else [query.payload]
+            if query.op in ("insert", "upsert") and any(p.get("driver_name") == "bad" for p in payloads):
+                raise APIError({"code": "23514", "message": "violates check constraint"})
+            return execute()
+
+        query.execute = checked
+        return query
+
+
+def test_only_the_lease_holder_replays(tmp_path):
+    clock = Clock()
+    path = str(tmp_path / "spool.sqlite3")
+    first, second = CallLogSpool(path, clock=clock), CallLogSpool(path, clock=clock, lease_seconds=300)
+    first.insert_call_log({"driver_name": "Mike", "external_call_id": "rt-1"})
+    supabase = FakeSupabase()
+
+    assert first.hold_replay_lease()
+    assert second.replay(supabase) == 0
+    assert first.replay(supabase) == 1
+    assert len(supabase.rows("call_logs")) == 1
+
+    # The holder went quiet: its lease lapses and another worker takes over
+    second.insert_call_log({"driver_name": "Sarah", "external_call_id": "rt-2"})
+    clock.now += 301
+    assert second.replay(supabase) == 1
+    assert not first.hold_replay_lease()
+
+
+def test_poison_insert_is_dead_lettered_with_its_updates(tmp_path):
+    spool = CallLogSpool(str(tmp_path / "spool.sqlite3"), max_attempts=2)
+    bad = spool.insert_call_log({"driver_name": "bad", "external_call_id": "rt-1"})
+    spool.update_call_log(bad["local_id"], {"transcript": "Hello?"})
+    spool.insert_call_log({"driver_name": "Sarah", "external_call_id": "rt-2"})
+    supabase = RejectingSupabase()
+
+    # The batch of both inserts fails; split up, the good one is blocked behind the bad one
+    assert spool.replay(supabase) == 0
+    assert spool.stats()["pending_ops"] == 3
+    assert spool.replay(supabase) == 1
+    assert [row["driver_name"] for row in supabase.rows("call_logs")] == ["Sarah"]
+    stats = spool.stats()
+    assert (stats["pending_ops"], stats["dead_ops"], stats["last_error"]) == (0, 2, None)
+
+
+def test_transient_failures_are_never_dead_lettered(tmp_path):
+    spool = CallLogSpool(str(tmp_path / "spool.sqlite3"), max_attempts=1)
+    spool.insert_call_log({"driver_name": "Mike", "external_call_id": "rt-1"})
+
+    class Down(FakeSupabase):
+        def table(self, name):
+            raise httpx.ConnectError("connection refused")
+
+    for _ in range(3):
+        assert spool.replay(Down()) == 0
+    stats = spool.stats()
+    assert (stats["pending_ops"], stats["dead_ops"], stats["max_attempts"]) == (1, 0, 3)
+    assert is_transient(APIError({"code": "40001", "message": "could not serialize access"}))
+    assert not is_transient(APIError({"code": "23505", "message": "duplicate key"}))
+
+
+def test_update_after_the_insert_died_does_not_block_later_ops(tmp_path):
+    spool = CallLogSpool(str(tmp_path / "spool.sqlite3"), max_attempts=2)
+    bad = spool.insert_call_log({"driver_name": "bad", "external_call_id": "rt-1"})
+    supabase = RejectingSupabase()
+    for _ in range(2):
+        assert spool.replay(supabase) == 0
+    assert spool.stats()["dead_ops"] == 1
+
+    # The webhook still finds the call, and its update is kept without entering the queue
+    assert spool.find_call_log("rt-1")["local_id"] == bad["local_id"]
+    spool.update_call_log(bad["local_id"], {"transcript": "Hello?"})
+    spool.insert_call_log({"driver_name": "Sarah", "external_call_id": "rt-2"})
+
+    assert spool.replay(supabase) == 1
+    stats = spool.stats()
+    assert (stats["pending_ops"], stats["dead_ops"], stats["last_error"]) == (0, 2, None)
+
+
+def test_insert_retried_after_a_lost_response_is_not_duplicated(tmp_path):
+    spool = CallLogSpool(str(tmp_path / "spool.sqlite3"))
+    local = spool.insert_call_log({"driver_name": "Mike", "external_call_id": "rt-1"})
+
+    class LostResponse(FakeSupabase):
+        """Commits the write, then times out before the response arrives."""
+
+        def table(self, name):
+            query = super().table(name)
+            execute = query.execute
+
+            def lost():
+                execute()
+                raise httpx.ReadTimeout("timed out")
+
+            query.execute = lost
+            return query
+
+    lossy = LostResponse()
+    assert spool.replay(lossy) == 0
+    supabase = FakeSupabase()
+    supabase.tables = lossy.tables
+    assert spool.replay(supabase) == 1
+
+    (row,) = supabase.rows("call_logs")
+    assert row["spool_id"] == local["local_id"]
+    assert spool.find_call_log("rt-1")["id"] == row["id"]
+
+
+def test_pending_updates_of_a_call_log_are_written_once(tmp_path):
+    spool = CallLogSpool(str(tmp_path / "spool.sqlite3"))
+    mike = spool.insert_call_log({"driver_name": "Mike", "external_call_id": "rt-1"})
+    sarah = spool.insert_call_log({"driver_name": "Sarah", "external_call_id": "rt-2"})
+    for i in range(5):
+        for local in (mike, sarah):
+            spool.update_call_log(local["local_id"], {"transcript": f"{local['driver_name']} {i}"})
+    supabase = FakeSupabase()
+
+    assert spool.replay(supabase) == 12
+
+    # One upsert for both inserts, one summary write per call log
+    assert supabase.requests.count(("call_logs", "upsert")) == 1
+    assert [name for name, _ in supabase.rpcs] == ["update_call_log_summary"] * 2
+    assert {row["driver_name"]: row["transcript"] for row in supabase.rows("call_logs")} == {
+        "Mike": "Mike 4",
+        "Sarah": "Sarah 4",
+    }
+    assert spool.stats()["pending_ops"] == 0
@@ -0,0 +1,35 @@
+import time
+
+from app import main
+
+
+def _wait_ready(client, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        response = client.get("/ready")
+        if response.status_code == 200 or time.monotonic() > deadline:
+            return response
+        time.sleep(0.01)
+
+
+def test_ready_once_warm_up_finishes(client):
+    response = _wait_ready(client)
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["components"] == {"settings": "ok", "http_pool": "ok", "supabase": "ok"}
+    assert body["warmup_ms"] is not None
+
+
+def test_first_turn_is_only_marked_by_a_conversation_turn(client, llm):
+    _wait_ready(client)
+
+    ended = client.post("/webhook", json={"event": "call_ended", "call_id": "rt-1", "transcript": "Bye."})
+    assert ended.status_code == 200
+    assert main.startup_state.first_turn_seconds is None
+    assert llm.calls == []
+
+    turn = client.post("/webhook", json={"event": "transcript.final", "call_id": "rt-1", "transcript": "I'm driving."})
+    assert turn.status_code == 200
+    assert len(llm.calls) == 1
+    assert main.startup_state.first_turn_seconds is not None